@@ -83,6 +83,9 @@ setup(
             "sphinxcontrib-seqdiag>=0.8.5",
             "sphinx_rtd_theme>=1.0.0"
         ],
+        "match": [
+            "numpy>=1.17",
+        ],
         "play": [
             "blessings>=1.6",
             "simpleaudio>=1.0.1",
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+# encoding: UTF-8
+
+# This file is part of turberfield.
+#
+# Turberfield is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Turberfield is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with turberfield.  If not, see <http://www.gnu.org/licenses/>.
+
+import hashlib
+import io
+import os
+import pickle
+import re
+import tempfile
+
+import docutils
+import docutils.parsers.rst.directives
+from docutils.parsers.rst.directives.misc import Include
+from docutils.statemachine import State
+from docutils.statemachine import StateMachine
+import docutils.transforms
+import docutils.utils
+
+from turberfield.utils.logger import LogManager
+
+
+class DocumentCache:
+    """Store parsed scene scripts on disk so they need never be parsed twice.
+
+    Documents are keyed on a hash of their text, the text of any files
+    they include, the version of docutils, and the set of directives
+    registered with the parser. Any change to those invalidates the entry.
+    The docutils environment is examined once, when the cache is created.
+
+    Assign an object of this class to
+    :py:attr:`turberfield.dialogue.model.SceneScript.cache`
+    to make all scene scripts use it.
+
+    :param str path: A directory in which to keep the cached documents.
+
+    """
+
+    include = re.compile(r"^[ \t]*\.\.[ \t]+include::[ \t]*(\S[^\n]*)$", re.MULTILINE)
+
+    class Pickler(pickle.Pickler):
+
+        def __init__(self, file, doc, *args, **kwargs):
+            super().__init__(file, *args, **kwargs)
+            self.doc = doc
+
+        def persistent_id(self, obj):
+            # Parser state is referenced by directive nodes; it is not needed
+            # once parsing is done and it cannot be pickled.
+            if obj is self.doc.settings:
+                return "settings"
+            elif isinstance(obj, (State, StateMachine)):
+                return "state"
+            else:
+                return None
+
+    class Unpickler(pickle.Unpickler):
+
+        def __init__(self, file, settings, *args, **kwargs):
+            super().__init__(file, *args, **kwargs)
+            self.settings = settings
+
+        def persistent_load(self, pid):
+            if pid == "settings":
+                return self.settings
+            else:
+                return None
+
+    @staticmethod
+    def signature():
+        """Describe the docutils environment in which a document is parsed.
+
+        :return: A string which changes whenever a different version of docutils
+            is installed or a directive is registered under a new name or class.
+
+        """
+        directives = docutils.parsers.rst.directives
+        registry = {
+            k: "docutils.parsers.rst.directives.{0}.{1}".format(*v)
+            for k, v in getattr(directives, "_directive_registry", {}).items()
+        }
+        registry.update({
+            k: "{0.__module__}.{0.__qualname__}".format(v)
+            for k, v in getattr(directives, "_directives", {}).items()
+        })
+        return "\n".join(
+            [docutils.__version__] +
+            ["{0}={1}".format(k, registry[k]) for k in sorted(registry)]
+        )
+
+    @staticmethod
+    def includes(text, path=None):
+        """Find the files which a scene script includes.
+
+        :param str text: Scene script text.
+        :param str path: The path to the scene script file. Relative
+            includes are found from the directory of this file, or from
+            the current directory if it is not given.
+        :return: A list of paths.
+
+        """
+        parent = os.path.dirname(os.path.abspath(path)) if path else os.getcwd()
+        rv = []
+        for arg in DocumentCache.include.findall(text):
+            arg = arg.strip()
+            if arg.startswith("<") and arg.endswith(">"):
+                rv.append(os.path.join(str(Include.standard_include_path), arg[1:-1]))
+            else:
+                rv.append(os.path.normpath(os.path.join(parent, arg)))
+        return rv
+
+    @staticmethod
+    def dumps(doc):
+        """Pickle a document.
+
+        :param doc: A document object.
+        :rtype: bytes
+
+        """
+        buf = io.BytesIO()
+        DocumentCache.Pickler(buf, doc, protocol=pickle.HIGHEST_PROTOCOL).dump(doc)
+        return buf.getvalue()
+
+    @staticmethod
+    def loads(data, settings):
+        """Unpickle a document.
+
+        :param bytes data: A document pickled by
+            :py:meth:`~turberfield.dialogue.cache.DocumentCache.dumps`.
+        :param settings: The docutils settings to attach to the document.
+        :return: A document object.
+
+        """
+        doc = DocumentCache.Unpickler(io.BytesIO(data), settings).load()
+
+        # The reporter and transformer are not pickled with a document
+        doc.reporter = docutils.utils.new_reporter(doc.get("source", ""), settings)
+        doc.transformer = docutils.transforms.Transformer(doc)
+        return doc
+
+    def __init__(self, path):
+        self.path = path
+        self.log = LogManager().get_logger("turberfield.dialogue.cache")
+        self.digest = hashlib.sha256(self.signature().encode("utf-8"))
+
+    def key(self, text, path=None):
+        """Generate the cache key for a scene script.
+
+        :param str text: Scene script text.
+        :param str path: The path to the scene script file, if any.
+            Included files are found relative to it.
+        :rtype: str
+
+        """
+        digest = self.digest.copy()
+        digest.update(text.encode("utf-8"))
+        pending = [(i, 1) for i in reversed(self.includes(text, path))]
+        seen = set()
+        while pending:
+            fP, depth = pending.pop()
+            digest.update("\0{0}\0{1}\0".format(depth, fP).encode("utf-8"))
+            if fP in seen:
+                continue
+            seen.add(fP)
+            try:
+                with open(fP, "rb") as included:
+                    data = included.read()
+            except OSError:
+                continue
+            digest.update(data)
+            pending.extend(
+                (i, depth + 1)
+                for i in reversed(self.includes(data.decode("utf-8", "replace"), fP))
+            )
+        return digest.hexdigest()
+
+    def location(self, key):
+        return os.path.join(self.path, key[:2], key + ".doc")
+
+    def get(self, key, settings):
+        """Retrieve a document from the cache.
+
+        :param str key: The cache key for the document.
+        :param settings: The docutils settings to attach to the document.
+        :return: A document object or `None` if not in the cache.
+
+        """
+        try:
+            with open(self.location(key), "rb") as cached:
+                return self.loads(cached.read(), settings)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            self.log.warning("Unable to load cached document", key=key, exception=e)
+            return None
+
+    def put(self, key, doc):
+        """Store a document in the cache.
+
+        The file is written to a temporary location and then moved into place,
+        so that many processes may share the same cache directory.
+
+        :param str key: The cache key for the document.
+        :param doc: A document object.
+        :return: The path to the cached file, or `None` if it could not be written.
+
+        """
+        try:
+            data = self.dumps(doc)
+        except Exception as e:
+            self.log.warning("Unable to pickle document", key=key, exception=e)
+            return None
+
+        fP = self.location(key)
+        try:
+            os.makedirs(os.path.dirname(fP), exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(fP), suffix=".tmp")
+            with os.fdopen(fd, "wb") as output:
+                output.write(data)
+            os.replace(tmp, fP)
+        except OSError as e:
+            self.log.warning("Unable to write cached document", key=key, exception=e)
+            return None
+        return fP
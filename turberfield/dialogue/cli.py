@@ -20,7 +20,7 @@
 import argparse
 import logging
 
-from turberfield.dialogue.directives import Pathfinder
+from turberfield.dialogue.pathfinder import Pathfinder
 from turberfield.utils.logger import Logger
 
 DEFAULT_PAUSE_SECS = 1.2
@@ -91,4 +91,8 @@ def add_performance_options(parser):
         "--dwell", type=float, default=DEFAULT_DWELL_SECS,
         help="Time in seconds [{0}] to dwell on each word.".format(DEFAULT_DWELL_SECS)
     )
+    parser.add_argument(
+        "--virtual", action="store_true", default=False,
+        help="Perform without pausing. Time is kept by a virtual clock."
+    )
     return parser
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# encoding: UTF-8
+
+# This file is part of turberfield.
+#
+# Turberfield is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Turberfield is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with turberfield.  If not, see <http://www.gnu.org/licenses/>.
+
+import asyncio
+from collections import namedtuple
+import time
+
+
+class Clock:
+    """The source of time for handlers which pace a performance.
+
+    This clock keeps wall time. Pauses block the thread,
+    or the task when awaited.
+
+    """
+
+    #: A record of one pause in the performance.
+    Pause = namedtuple("Pause", ["at", "interval", "obj"])
+
+    def time(self):
+        """Report the current time.
+
+        :return: A time in seconds. Only differences between times are meaningful.
+
+        """
+        return time.monotonic()
+
+    def sleep(self, interval, obj=None):
+        """Pause the performance.
+
+        :param float interval: The time in seconds to pause.
+        :param obj: The event which is the cause of the pause.
+
+        """
+        time.sleep(interval)
+
+    async def wait(self, interval, obj=None):
+        """Pause the performance without blocking the event loop.
+
+        :param float interval: The time in seconds to pause.
+        :param obj: The event which is the cause of the pause.
+
+        """
+        await asyncio.sleep(interval)
+
+
+class VirtualClock(Clock):
+    """A clock whose time passes only when the performance pauses.
+
+    A pause returns at once, having advanced the clock by its interval.
+    Every pause is recorded in the timeline of the clock, so a performance
+    may run at full speed and still provide its timings.
+
+    :param float start: The time in seconds at which the clock begins.
+
+    """
+
+    def __init__(self, start=0.0):
+        self.now = start
+        self.timeline = []
+
+    def time(self):
+        return self.now
+
+    def sleep(self, interval, obj=None):
+        interval = max(0, interval)
+        self.timeline.append(self.Pause(self.now, interval, obj))
+        self.now += interval
+
+    async def wait(self, interval, obj=None):
+        self.sleep(interval, obj)
+        await asyncio.sleep(0)
@@ -0,0 +1,723 @@
+#!/usr/bin/env python3
+# encoding: UTF-8
+
+# This file is part of turberfield.
+#
+# Turberfield is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Turberfield is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with turberfield.  If not, see <http://www.gnu.org/licenses/>.
+
+from collections import defaultdict
+from collections import namedtuple
+from collections import OrderedDict
+import html.entities
+import operator
+import re
+import string
+
+from turberfield.dialogue.events import Condition
+from turberfield.dialogue.events import Line
+from turberfield.dialogue.pathfinder import Pathfinder
+from turberfield.dialogue.types import Ensemble
+from turberfield.dialogue.types import Stateful
+from turberfield.utils.logger import LogManager
+
+
+#: A translation table which escapes text for HTML. It is built once, and
+#: shared by all scripts.
+escape_table = str.maketrans({
+    v: "&" + k for k, v in html.entities.html5.items()
+    if k.endswith(";") and len(v) == 1
+    and v not in "!\"#'()*+,-..:;=@{}~"
+})
+
+#: The characters which :py:data:`escape_table` replaces.
+escape_chars = frozenset(chr(i) for i in escape_table)
+
+
+def escape(text):
+    """Replace with character references those characters which need escaping in HTML.
+
+    Text which needs no escaping is returned as it is.
+
+    """
+    return text if escape_chars.isdisjoint(text) else text.translate(escape_table)
+
+
+class Entity(namedtuple("Entity", ["names", "types", "states", "roles"])):
+    """The declaration of an entity in a scene script.
+
+    The options are kept as the strings written in the script.
+
+    """
+
+    __slots__ = ()
+
+    @classmethod
+    def declared(cls, node):
+        """Create an Entity from an entity declaration in a docutils document."""
+        return cls(
+            tuple(node["names"]),
+            tuple(node["options"].get("types", [])),
+            tuple(node["options"].get("states", [])),
+            tuple(node["options"].get("roles", [])),
+        )
+
+
+class Placeholder:
+    """A part of a compiled script which can't be known until it is cast."""
+
+    __slots__ = ()
+
+    @staticmethod
+    def value(obj, cast):
+        return obj.resolve(cast) if isinstance(obj, Placeholder) else obj
+
+    def resolve(self, cast):
+        raise NotImplementedError
+
+
+class Reference(
+    namedtuple("Reference", ["name", "attr", "default"], defaults=("", None)), Placeholder
+):
+    """The persona cast as an entity, or an attribute of that persona.
+
+    The default is returned when the entity is not cast or the persona
+    has no such attribute.
+
+    """
+
+    __slots__ = ()
+
+    def resolve(self, cast):
+        try:
+            persona = cast.personae[self.name]
+            return cast.lookup(self.name, self.attr) if self.attr else persona
+        except (AttributeError, KeyError):
+            return Placeholder.value(self.default, cast)
+
+
+class Substitution(namedtuple("Substitution", ["name", "attr", "html"]), Placeholder):
+    """A substitution reference to a persona property in the text of a line."""
+
+    __slots__ = ()
+
+    def resolve(self, cast):
+        if cast.personae.get(self.name) is None:
+            return None
+
+        try:
+            val = format(cast.lookup(self.name, self.attr), "")
+        except AttributeError:
+            return None
+
+        if self.html:
+            return '<span class="ref">{0}</span>'.format(escape(val))
+        else:
+            return val.strip()
+
+
+class Fragments(namedtuple("Fragments", ["parts", "sep"]), Placeholder):
+    """Text assembled from literal strings and placeholders."""
+
+    __slots__ = ()
+
+    def resolve(self, cast):
+        return self.sep.join(
+            i for i in (Placeholder.value(i, cast) for i in self.parts) if i is not None
+        )
+
+
+class Template(namedtuple("Template", ["text", "slots"]), Placeholder):
+    """A directive argument containing substitution references.
+
+    The slots are pairs of substitution label and its value, which
+    may be a string or a :py:class:`Reference`.
+
+    """
+
+    __slots__ = ()
+
+    regex = re.compile(r"\|(\w+)\|")
+
+    def resolve(self, cast):
+        slots = dict(self.slots)
+        return self.regex.sub(
+            lambda x: str(Placeholder.value(slots.get(x.group(1), ""), cast)).strip(),
+            self.text
+        )
+
+
+class Conversion(namedtuple("Conversion", ["text"]), Placeholder):
+    """A directive argument to be interpreted as an integer or an importable object."""
+
+    __slots__ = ()
+
+    @staticmethod
+    def convert(text):
+        try:
+            return int(text) if text.isdigit() else Pathfinder.string_import(text)
+        except ValueError:
+            return text
+
+    def resolve(self, cast):
+        return self.convert(Placeholder.value(self.text, cast))
+
+
+class Assignment(namedtuple("Assignment", ["text"]), Placeholder):
+    """The value of a property setter whose argument contains substitution references.
+
+    The argument may resolve to another entity, in which case that persona
+    (or its attribute) is the value.
+
+    """
+
+    __slots__ = ()
+
+    def resolve(self, cast):
+        text = Placeholder.value(self.text, cast)
+        name, dot, attr = text.partition(".")
+        return Reference(name.lower(), attr, Conversion(text)).resolve(cast)
+
+
+class Predicate:
+    """The test of a condition, prepared once so that it may be evaluated often.
+
+    Call the object with the subject and the value of a
+    :py:class:`~turberfield.dialogue.model.Model.Condition`.
+    The result is that of :py:meth:`turberfield.dialogue.performer.Performer.allows`.
+
+    :param str format_: The path to the attribute under test, as in a format string.
+    :param regex: An optional compiled regular expression to match.
+
+    """
+
+    __slots__ = ("format", "regex", "test")
+
+    #: Types whose values compare equal exactly when their string forms do.
+    typed = (bool, int, str)
+
+    @staticmethod
+    def compile(format_, regex=None):
+        """Create a function to test a condition.
+
+        :param str format_: The path to the attribute under test.
+        :param regex: An optional compiled regular expression to match.
+        :return: A function which takes the subject and value of the condition.
+
+        """
+        typed = Predicate.typed
+        match = regex.match if regex else None
+
+        if not format_ or any(i in format_ for i in "[]{}!:"):
+            # Leave anything but a plain attribute path to the format machinery
+            fmt = "".join(("{0.", format_, "}"))
+
+            def test(obj, value):
+                try:
+                    lhs = fmt.format(obj)
+                except (AttributeError, IndexError, KeyError, ValueError):
+                    return False
+                return match(lhs) if match else lhs == str(value)
+
+        elif match:
+            get = operator.attrgetter(format_)
+
+            def test(obj, value):
+                try:
+                    lhs = format(get(obj), "")
+                except (AttributeError, IndexError, KeyError, ValueError):
+                    return False
+                return match(lhs)
+
+        else:
+            get = operator.attrgetter(format_)
+
+            def test(obj, value):
+                try:
+                    lhs = get(obj)
+                    if lhs.__class__ is value.__class__ and value.__class__ in typed:
+                        return lhs == value
+                    lhs = format(lhs, "")
+                except (AttributeError, IndexError, KeyError, ValueError):
+                    return False
+                return lhs == str(value)
+
+        if format_ != "state":
+            return test
+
+        attribute = test
+        if match:
+            def test(obj, value):
+                if isinstance(obj, Stateful):
+                    return match(str(obj.state))
+                return attribute(obj, value)
+        else:
+            def test(obj, value):
+                if isinstance(obj, Stateful):
+                    return obj.get_state(type(value)) == value
+                return attribute(obj, value)
+        return test
+
+    def __init__(self, format_, regex=None):
+        self.format = format_
+        self.regex = regex
+        self.test = self.compile(format_, regex)
+
+    def __call__(self, obj, value):
+        return self.test(obj, value)
+
+    def __eq__(self, other):
+        if isinstance(other, Predicate):
+            return (self.format, self.regex) == (other.format, other.regex)
+        return NotImplemented
+
+    def __hash__(self):
+        return hash((self.format, self.regex))
+
+    def __reduce__(self):
+        # Functions are not pickled; they are created afresh
+        return (Predicate, (self.format, self.regex))
+
+    def __repr__(self):
+        return "Predicate({0.format!r}, {0.regex!r})".format(self)
+
+
+class Cast:
+    """A compiled script bound to the personae who perform it.
+
+    Iterate over this object to obtain the events of the performance.
+
+    Each attribute of a persona which the script refers to is looked up
+    only once for the cast, before the first event is generated. Every
+    later reference reuses that value, so the text of the performance is
+    fixed when it begins, just as when a script is cast and run by
+    :py:class:`~turberfield.dialogue.model.Model`.
+
+    :param script: A :py:class:`CompiledScript` or
+        :py:class:`~turberfield.dialogue.model.Model` object.
+    :param personae: A dictionary of {name: persona}.
+
+    """
+
+    formatter = string.Formatter()
+
+    def __init__(self, script, personae):
+        self.script = script
+        self.personae = personae
+        self.memo = {}
+        self.primed = False
+        self.start = 0
+        self.skipping = False
+        self.gates = None
+
+    def __iter__(self):
+        self.prime()
+        shots = self.script.shots
+        for n in range(self.start, len(shots)):
+            shot = shots[n]
+            items = shot.items
+            i = 0
+            while i < len(items):
+                item = self.bind(items[i])
+                if item is not None:
+                    yield shot, item
+                i += 1
+                if self.skipping:
+                    self.skipping = False
+                    if self.gates is None:
+                        self.gates = self.script.condition_index
+                    i = next((j for j in self.gates[n] if j >= i), len(items))
+
+    @property
+    def metadata(self):
+        self.prime()
+        return [(k, self.resolve(v)) for k, v in self.script.fields]
+
+    def prime(self):
+        """Look up all the attributes of personae which the script refers to."""
+        if not self.primed:
+            self.primed = True
+            for name, attr in getattr(self.script, "lookups", ()):
+                if name in self.personae:
+                    try:
+                        self.lookup(name, attr)
+                    except AttributeError:
+                        pass
+
+    def lookup(self, name, attr):
+        """Find an attribute of the persona cast as an entity.
+
+        The value is remembered for the rest of the performance.
+
+        :param str name: The name of the entity.
+        :param str attr: A dotted path to the attribute. Indexes are allowed,
+            as in a format string.
+        :raises KeyError: If the entity is not cast.
+        :raises AttributeError: If the attribute can't be found.
+
+        """
+        key = (name, attr)
+        try:
+            rv = self.memo[key]
+        except KeyError:
+            persona = self.personae[name]
+            try:
+                rv, _ = self.formatter.get_field("0." + attr, (persona,), {})
+            except (AttributeError, IndexError, KeyError, TypeError, ValueError) as e:
+                rv = e
+            self.memo[key] = rv
+
+        if isinstance(rv, Exception):
+            raise AttributeError(*rv.args)
+        return rv
+
+    def resolve(self, obj):
+        return Placeholder.value(obj, self)
+
+    def seek(self, scene, shot):
+        """Begin the performance at a given shot.
+
+        Earlier shots are skipped without generating their events.
+
+        :param str scene: The name of the scene.
+        :param str shot: The name of the shot.
+        :raises KeyError: If the script has no such shot.
+        :return: This object.
+
+        """
+        self.start = self.script.shot_index[(scene, shot)]
+        return self
+
+    def skip(self):
+        """Skip the items which follow the most recent one in its shot.
+
+        Iteration resumes at the next condition of the shot, or else
+        at the start of the next shot. Skipped items are not bound.
+
+        """
+        self.skipping = True
+
+    def bind(self, item):
+        """Resolve all the placeholders in an event.
+
+        :return: An event of the same type, ready to be performed. A line
+            whose text consists only of substitutions which resolve to
+            nothing is dropped, and `None` is returned instead.
+
+        """
+        if not any(isinstance(i, Placeholder) for i in item):
+            return item
+
+        rv = item._replace(**{
+            k: v.resolve(self)
+            for k, v in zip(item._fields, item)
+            if isinstance(v, Placeholder)
+        })
+        return None if isinstance(rv, Line) and not rv.text else rv
+
+
+class CompiledScript:
+    """A scene script compiled to a form which needs neither docutils nor a cast.
+
+    Create one with :py:meth:`turberfield.dialogue.model.SceneScript.compile`.
+    Compiled scripts may be pickled, and shared by any number of performances.
+
+    :param str fP: The path to the scene script file.
+    :param entities: A sequence of :py:class:`Entity` objects.
+    :param shots: A sequence of
+        :py:class:`~turberfield.dialogue.model.Model.Shot` objects.
+    :param fields: A sequence of (name, value) pairs of script metadata.
+    :param lookups: A sequence of (entity name, attribute) pairs which the
+        script refers to.
+
+    The `shot_index` attribute maps each (scene, shot) to its position in `shots`.
+    See :py:meth:`~turberfield.dialogue.compiled.CompiledScript.index`.
+    The `condition_index` attribute records where the conditions are in each shot.
+    See :py:meth:`~turberfield.dialogue.compiled.CompiledScript.conditions`.
+
+    """
+
+    #: The logger shared by all scene scripts. See :py:meth:`logger`.
+    log = None
+
+    #: The routes of the main logger last copied to each of its clones.
+    #: See :py:meth:`follow`.
+    routes = {}
+
+    @staticmethod
+    def follow(log, name="main"):
+        """Keep a clone of a logger routed as the original is now.
+
+        A clone is given the routes of its original only when it is made.
+        This method copies them again whenever they have changed since,
+        so that routes and levels configured later take effect.
+
+        :param log: A logger cloned from the one named.
+        :param str name: The name of the original logger.
+        :return: The clone.
+
+        """
+        manager = log.manager
+        routes = frozenset(
+            (route.level, route.adapter, route.endpoint)
+            for pair, group in manager.pairings if pair.logger_name == name
+            for route in group
+        )
+        if CompiledScript.routes.get(log.name) != routes:
+            for pair, group in manager.pairings:
+                if pair.logger_name == log.name:
+                    group.clear()
+            for level, adapter, endpoint in routes:
+                manager.set_route(log, level, adapter, endpoint, replace=False)
+            CompiledScript.routes[log.name] = routes
+        return log
+
+    @staticmethod
+    def logger():
+        """Get the logger shared by compiled and parsed scene scripts.
+
+        It is created on first use, and follows the routes of the main logger.
+        See :py:meth:`follow`.
+
+        """
+        if CompiledScript.log is None:
+            log_manager = LogManager()
+            CompiledScript.log = log_manager.clone(
+                log_manager.get_logger("main"), "turberfield.dialogue.model.scenescript"
+            )
+        return CompiledScript.follow(CompiledScript.log)
+
+    @staticmethod
+    def index(shots):
+        """Find the position of each shot in a sequence.
+
+        :param shots: A sequence of
+            :py:class:`~turberfield.dialogue.model.Model.Shot` objects.
+        :return: An OrderedDict of {(scene, shot): offset}. Where shots share
+            a name, the offset is that of the first.
+
+        """
+        rv = OrderedDict()
+        for n, shot in enumerate(shots):
+            rv.setdefault((shot.scene, shot.name), n)
+        return rv
+
+    @staticmethod
+    def conditions(shots):
+        """Find the position of each condition in a sequence of shots.
+
+        :param shots: A sequence of
+            :py:class:`~turberfield.dialogue.model.Model.Shot` objects.
+        :return: A tuple with one element per shot. Each is a tuple of the
+            offsets of the Condition events among the items of that shot.
+
+        """
+        return tuple(
+            tuple(n for n, item in enumerate(shot.items) if isinstance(item, Condition))
+            for shot in shots
+        )
+
+    @staticmethod
+    def requirements(entity, relative=False):
+        """Import the types and states an entity requires of its persona.
+
+        :return: A tuple of (types, states).
+
+        """
+        types = tuple(filter(
+            None,
+            (Pathfinder.string_import(t, relative) for t in entity.types)
+        ))
+        states = tuple(filter(
+            None,
+            (int(t) if t.isdigit() else Pathfinder.string_import(t, relative)
+             for t in entity.states)
+        ))
+        return types, states
+
+    @staticmethod
+    def match(entities, personae, relative=False, roles=1, path=None):
+        """Select a persona for each of a sequence of entities, casting as many as possible.
+
+        Casting is solved as a bipartite matching between entities and personae
+        by augmenting paths. Each persona may play up to `roles` entities,
+        provided each of those entities names the others (or is named by them)
+        in its `:roles:` option.
+
+        When each persona plays only one role, the result is a maximum matching,
+        so every entity is cast whenever that is possible.
+
+        The parameters and return value are those of
+        :py:meth:`~turberfield.dialogue.compiled.CompiledScript.choose`.
+
+        """
+
+        def constrained(entity):
+            return len(entity.types) + len(entity.states)
+
+        def sharing(entity, group):
+            return len(group) < roles and all(
+                set(entity.names) & otherRoles[other] or set(other.names) & otherRoles[entity]
+                for other in group
+            )
+
+        def eligible(entity):
+            types, states = CompiledScript.requirements(entity, relative)
+            typ = types or object
+            return (
+                i for i in pool.candidates(types, states)
+                if isinstance(i, typ) and
+                getattr(i, "get_state", not states) and
+                all(str(i.get_state(type(s))).startswith(str(s)) for s in states)
+            )
+
+        def candidates(entity):
+            # Personae are found as the search needs them, and remembered
+            found = seen[entity]
+            yield from found
+            for persona in sources[entity]:
+                found.append(persona)
+                yield persona
+
+        def augment(entity, visited):
+            for persona in candidates(entity):
+                if persona in visited:
+                    continue
+                visited.add(persona)
+
+                group = playing[persona]
+                if not group or sharing(entity, group):
+                    group.append(entity)
+                    rv[entity] = persona
+                    return True
+
+                for other in list(group):
+                    rest = [i for i in group if i is not other]
+                    if (not rest or sharing(entity, rest)) and augment(other, visited):
+                        group.remove(other)
+                        group.append(entity)
+                        rv[entity] = persona
+                        return True
+            return False
+
+        log = CompiledScript.logger()
+        pool = personae if isinstance(personae, Ensemble) else Ensemble(personae)
+        log.debug(pool, {"path": path})
+        entities = sorted(entities, key=constrained, reverse=True)
+        otherRoles = {e: {i.lower() for i in e.roles} for e in entities}
+        sources = {e: eligible(e) for e in entities}
+        seen = defaultdict(list)
+        playing = defaultdict(list)
+        rv = OrderedDict([(e, None) for e in entities])
+        for e in entities:
+            if not augment(e, set()):
+                log.debug(
+                    "No persona for entity {0} with {1} {2}.".format(
+                        e.names[0], roles, "role" if roles == 1 else "roles"
+                    ),
+                    {"path": path}
+                )
+        return rv
+
+    @staticmethod
+    def choose(entities, personae, relative=False, roles=1, path=None, optimal=False):
+        """Select a persona for each of a sequence of entities.
+
+        :param entities: A sequence of :py:class:`Entity` objects.
+        :param personae: A sequence of Personae, or an
+            :py:class:`~turberfield.dialogue.types.Ensemble` to search more quickly.
+        :param bool relative: Affects imports from namespace packages.
+            Used for testing only.
+        :param int roles: The maximum number of roles allocated to each persona.
+        :param bool optimal: If `True`, use
+            :py:meth:`~turberfield.dialogue.compiled.CompiledScript.match`
+            instead of allocating each entity the first persona which fits.
+        :return: An OrderedDict of {Entity: Persona}.
+
+        """
+        if optimal:
+            return CompiledScript.match(entities, personae, relative, roles, path)
+
+        def constrained(entity):
+            return len(entity.types) + len(entity.states)
+
+        log = CompiledScript.logger()
+        rv = OrderedDict()
+        performing = defaultdict(set)
+        pool = personae if isinstance(personae, Ensemble) else Ensemble(personae)
+        cast = set()
+        log.debug(pool, {"path": path})
+        entities = OrderedDict([
+            ("".join(entity.names), entity)
+            for entity in sorted(entities, key=constrained, reverse=True)
+        ])
+        for e in entities.values():
+            types, states = CompiledScript.requirements(e, relative)
+            otherRoles = {i.lower() for i in e.roles}
+            typ = types or object
+            persona = next(
+                (i for i in pool.candidates(types, states)
+                 if i not in cast and
+                 isinstance(i, typ) and
+                 getattr(i, "get_state", not states) and
+                 all(str(i.get_state(type(s))).startswith(str(s)) for s in states) and
+                 (performing[i].issubset(otherRoles) or not otherRoles)),
+                None
+            )
+            rv[e] = persona
+            performing[persona].update(set(e.names))
+
+            if not otherRoles or list(rv.values()).count(persona) == roles:
+                if persona is not None:
+                    cast.add(persona)
+                else:
+                    log.debug(
+                        "No persona for type {0} and states {1} with {2} {3}.".format(
+                            typ, states, roles, "role" if roles == 1 else "roles"
+                        ),
+                        {"path": path}
+                    )
+        return rv
+
+    def __init__(self, fP, entities=(), shots=(), fields=(), lookups=()):
+        self.fP = fP
+        self.entities = tuple(entities)
+        self.shots = tuple(i._replace(items=tuple(i.items)) for i in shots)
+        self.fields = tuple(fields)
+        self.lookups = tuple(lookups)
+        self.shot_index = self.index(self.shots)
+        self.condition_index = self.conditions(self.shots)
+
+    def select(self, personae, relative=False, roles=1, optimal=False):
+        """Select a persona for each entity declared in the script.
+
+        :param personae: A sequence of Personae.
+        :param bool relative: Affects imports from namespace packages.
+            Used for testing only.
+        :param int roles: The maximum number of roles allocated to each persona.
+        :param bool optimal: Solve the casting as a matching problem.
+        :return: An OrderedDict of {Entity: Persona}.
+
+        """
+        return self.choose(
+            self.entities, personae, relative, roles, path=self.fP, optimal=optimal
+        )
+
+    def cast(self, selection):
+        """Bind the script to a cast of personae.
+
+        :param selection: A dictionary of {Entity: Persona}.
+        :rtype: :py:class:`Cast`
+
+        """
+        return Cast(self, {name: p for e, p in selection.items() for name in e.names})
@@ -17,82 +17,12 @@
 # along with turberfield.  If not, see <http://www.gnu.org/licenses/>.
 
 
-import importlib.util
-import os.path
-import sys
-
 import docutils.nodes
 from docutils.nodes import BackLinkable, Element, General, Inline
 from docutils.nodes import Labeled, Targetable, TextElement
 import docutils.parsers.rst
 
-from turberfield.utils.logger import LogManager
-
-
-class Pathfinder:
-
-    @staticmethod
-    def string_import(arg, relative=False, sep=None, path=None, line_nr=None):
-        log = LogManager().get_logger(
-            "turberfield.dialogue.model"
-        ).clone("turberfield.dialogue.directives")
-        arg = arg.strip()
-        if not arg:
-            log.warning(
-                "Empty argument",
-                {"path": path, "line_nr": line_nr},
-            )
-            return None
-
-        try:
-            return int(arg)
-        except ValueError:
-            pass
-
-        bits = arg.split(".")
-        if sep is None:
-            index = min(n for n, i in enumerate(bits) if i and i[0].isupper())
-        elif sep != ".":
-            index = min(n for n, i in enumerate(bits) if i and sep in i) + 1
-            bits = arg.replace(sep, ".").split(".")
-        else:
-            index = -1
-
-        start = 1 if relative else 0
-        modName = ".".join(bits[start:index])
-        try:
-            # Try importing an installed module
-            mod = importlib.import_module(modName)
-        except ImportError:
-            # Try importing a source file at this location
-            mN = bits[index - 1]
-            spec = importlib.util.spec_from_file_location(
-                mN,
-                os.path.abspath(modName.replace(".", os.sep)) + ".py"
-            )
-            if spec is None:
-                return None
-            mod = importlib.util.module_from_spec(spec)
-            spec.loader.exec_module(mod)
-            sys.modules[mN] = mod
-
-        obj = mod
-        for name in bits[index:]:
-            try:
-                obj = getattr(obj, name)
-            except AttributeError:
-                log.warning(
-                    "Object missing an attribute",
-                    {"path": path, "line_nr": line_nr},
-                    token=name
-                )
-                return None
-
-        return obj
-
-    @staticmethod
-    def string_split(arg):
-        return arg.split()
+from turberfield.dialogue.pathfinder import Pathfinder
 
 
 class Entity(docutils.parsers.rst.Directive):
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+# encoding: UTF-8
+
+# This file is part of turberfield.
+#
+# Turberfield is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Turberfield is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with turberfield.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+The types of event generated by a scene script.
+
+They are defined here, apart from the docutils document model, so that a
+compiled script can be performed without importing docutils.
+They are available also as attributes of
+:py:class:`~turberfield.dialogue.model.Model`.
+
+"""
+
+import operator
+import sys
+
+from turberfield.utils.assembly import Assembly
+
+
+class Event:
+    """Base class of the event types.
+
+    Events behave like named tuples, but keep their fields in `__slots__`.
+    They need less memory than a tuple of the same length, which matters
+    when a large corpus of dialogue is held in memory.
+
+    The `path` of the source file is interned, so that every event from
+    the same file shares one string.
+
+    A subclass declares its fields as both `__slots__` and `_fields`,
+    and assigns them in `__init__` with :py:meth:`Event.assign`.
+
+    """
+
+    __slots__ = ()
+
+    _fields = ()
+    _field_defaults = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.__match_args__ = cls._fields
+        cls._values = staticmethod(operator.attrgetter(*cls._fields))
+
+    @staticmethod
+    def assign(obj, path, line_nr, **kwargs):
+        for name, value in kwargs.items():
+            object.__setattr__(obj, name, value)
+        object.__setattr__(obj, "path", sys.intern(path) if path.__class__ is str else path)
+        object.__setattr__(obj, "line_nr", line_nr)
+
+    @classmethod
+    def _make(cls, iterable):
+        return cls(*iterable)
+
+    def _asdict(self):
+        return dict(zip(self._fields, self._values(self)))
+
+    def _replace(self, **kwargs):
+        rv = type(self)(*map(kwargs.pop, self._fields, self._values(self)))
+        if kwargs:
+            raise ValueError("Got unexpected field names: {0!r}".format(list(kwargs)))
+        return rv
+
+    def __setattr__(self, name, value):
+        raise AttributeError("can't set attribute")
+
+    def __delattr__(self, name):
+        raise AttributeError("can't delete attribute")
+
+    def __iter__(self):
+        return iter(self._values(self))
+
+    def __len__(self):
+        return len(self._fields)
+
+    def __getitem__(self, key):
+        return self._values(self)[key]
+
+    def __eq__(self, other):
+        if isinstance(other, Event):
+            return self._values(self) == other._values(other)
+        elif isinstance(other, tuple):
+            return self._values(self) == other
+        else:
+            return NotImplemented
+
+    def __hash__(self):
+        return hash(self._values(self))
+
+    def __reduce__(self):
+        return (type(self), self._values(self))
+
+    def __repr__(self):
+        return "{0}({1})".format(
+            type(self).__name__,
+            ", ".join("{0}={1!r}".format(k, v) for k, v in zip(self._fields, self))
+        )
+
+
+class Shot(Event):
+
+    __slots__ = _fields = ("name", "scene", "items", "path", "line_nr")
+    _field_defaults = {"path": None, "line_nr": None}
+
+    def __init__(self, name, scene, items, path=None, line_nr=None):
+        Event.assign(self, path, line_nr, name=name, scene=scene, items=items)
+
+
+class Property(Event):
+
+    __slots__ = _fields = ("entity", "object", "attr", "val", "path", "line_nr")
+    _field_defaults = {"path": None, "line_nr": None}
+
+    def __init__(self, entity, object, attr, val, path=None, line_nr=None):
+        Event.assign(self, path, line_nr, entity=entity, object=object, attr=attr, val=val)
+
+
+class Audio(Event):
+
+    __slots__ = _fields = (
+        "package", "resource", "offset", "duration", "loop", "path", "line_nr"
+    )
+    _field_defaults = {"path": None, "line_nr": None}
+
+    def __init__(
+        self, package, resource, offset, duration, loop, path=None, line_nr=None
+    ):
+        Event.assign(
+            self, path, line_nr,
+            package=package, resource=resource, offset=offset, duration=duration, loop=loop
+        )
+
+
+class Still(Event):
+
+    __slots__ = _fields = (
+        "package", "resource", "offset", "duration", "loop",
+        "label", "width", "height", "path", "line_nr"
+    )
+    _field_defaults = {"path": None, "line_nr": None}
+
+    def __init__(
+        self, package, resource, offset, duration, loop, label, width, height,
+        path=None, line_nr=None
+    ):
+        Event.assign(
+            self, path, line_nr,
+            package=package, resource=resource, offset=offset, duration=duration, loop=loop,
+            label=label, width=width, height=height
+        )
+
+
+class Video(Event):
+
+    __slots__ = _fields = (
+        "package", "resource", "offset", "duration", "loop",
+        "label", "width", "height", "poster", "url", "path", "line_nr"
+    )
+    _field_defaults = {"path": None, "line_nr": None}
+
+    def __init__(
+        self, package, resource, offset, duration, loop, label, width, height, poster, url,
+        path=None, line_nr=None
+    ):
+        Event.assign(
+            self, path, line_nr,
+            package=package, resource=resource, offset=offset, duration=duration, loop=loop,
+            label=label, width=width, height=height, poster=poster, url=url
+        )
+
+
+class Memory(Event):
+
+    __slots__ = _fields = ("subject", "object", "state", "text", "html", "path", "line_nr")
+    _field_defaults = {"path": None, "line_nr": None}
+
+    def __init__(self, subject, object, state, text, html, path=None, line_nr=None):
+        Event.assign(
+            self, path, line_nr,
+            subject=subject, object=object, state=state, text=text, html=html
+        )
+
+
+class Line(Event):
+
+    __slots__ = _fields = ("persona", "text", "html", "path", "line_nr")
+    _field_defaults = {"path": None, "line_nr": None}
+
+    def __init__(self, persona, text, html, path=None, line_nr=None):
+        Event.assign(self, path, line_nr, persona=persona, text=text, html=html)
+
+
+class Condition(Event):
+
+    __slots__ = _fields = (
+        "object", "format", "regex", "value", "path", "line_nr", "predicate"
+    )
+    _field_defaults = {"path": None, "line_nr": None, "predicate": None}
+
+    def __init__(self, object, format, regex, value, path=None, line_nr=None, predicate=None):
+        Event.assign(
+            self, path, line_nr,
+            object=object, format=format, regex=regex, value=value, predicate=predicate
+        )
+
+
+Assembly.register(Audio, Line, Memory, Property, Still, Video)
+for typ in (Audio, Line, Memory, Property, Still, Video):
+    # Keep the tags of events serialized when these types were defined in the model
+    tag = "turberfield.dialogue.model.{0}".format(typ.__name__)
+    Assembly.decoding[tag] = typ
+    Assembly.encoding[typ] = tag
@@ -22,7 +22,6 @@ from collections.abc import MutableSequence
 import logging
 import sys
 import textwrap
-import time
 import wave
 
 import pkg_resources
@@ -32,6 +31,7 @@ except ImportError:
     simpleaudio = None
 
 import turberfield.dialogue.cli
+from turberfield.dialogue.clock import Clock
 from turberfield.dialogue.model import Model
 from turberfield.dialogue.model import SceneScript
 from turberfield.dialogue.schema import SchemaBase
@@ -55,6 +55,10 @@ class TerminalHandler:
     :param float pause: The time in seconds to pause on a line of dialogue.
     :param float dwell: The time in seconds to dwell on a word of dialogue.
     :param log: An optional log object.
+    :param clock: An optional :py:class:`~turberfield.dialogue.clock.Clock` object
+        to pace the performance. Pass a
+        :py:class:`~turberfield.dialogue.clock.VirtualClock` to perform without
+        waiting.
 
     """
     pause = turberfield.dialogue.cli.DEFAULT_PAUSE_SECS
@@ -163,7 +167,7 @@ class TerminalHandler:
             file=self.terminal.stream
         )
         interval = self.pause + self.dwell * obj.text.count(" ")
-        time.sleep(interval)
+        self.wait(interval, obj)
         return obj
 
     def handle_memory(self, obj):
@@ -234,7 +238,7 @@ class TerminalHandler:
             end="\n" * 3,
             file=self.terminal.stream
         )
-        time.sleep(self.pause)
+        self.wait(self.pause, obj)
         return obj
 
     def handle_scenescript(self, obj):
@@ -281,12 +285,13 @@ class TerminalHandler:
 
     def __init__(
         self, terminal, dbPath=None,
-        pause=pause, dwell=dwell, log=None
+        pause=pause, dwell=dwell, log=None, clock=None
     ):
         self.terminal = terminal
         self.dbPath = dbPath
         self.pause = pause
         self.dwell = dwell
+        self.clock = clock or Clock()
 
         self.log_manager = LogManager()
         self.log = log or self.log_manager.clone(
@@ -294,9 +299,47 @@ class TerminalHandler:
         )
 
         self.shot = None
+        self.pauses = None
         self.con = Connection(**Connection.options(paths=[dbPath] if dbPath else []))
         self.handle_creation()
 
+    def wait(self, interval, obj=None):
+        """Pause the performance.
+
+        The pause is made by the clock of the handler. Within
+        :py:meth:`~turberfield.dialogue.handlers.TerminalHandler.play`
+        it is awaited instead.
+
+        :param float interval: The time in seconds to pause.
+        :param obj: The event which is the cause of the pause.
+
+        """
+        if self.pauses is None:
+            self.clock.sleep(interval, obj)
+        else:
+            self.pauses.append((interval, obj))
+
+    async def play(self, obj, *args, loop, **kwargs):
+        """Handle an event without blocking the event loop.
+
+        This method takes the same arguments as the handler itself, and
+        generates the same results. Pass it as the handler to
+        :py:func:`~turberfield.dialogue.player.arehearse`.
+        Pauses are awaited with the `wait` method of the clock.
+
+        This method is an asynchronous generator.
+
+        """
+        self.pauses = []
+        try:
+            for rv in self(obj, *args, loop=loop, **kwargs):
+                while self.pauses:
+                    interval, item = self.pauses.pop(0)
+                    await self.clock.wait(interval, item)
+                yield rv
+        finally:
+            self.pauses = None
+
     def __call__(self, obj, *args, loop, **kwargs):
         if isinstance(obj, Model.Line):
             try:
@@ -319,8 +362,11 @@ class TerminalHandler:
             self.shot = obj
         elif isinstance(obj, SceneScript):
             yield self.handle_scenescript(obj)
-        elif asyncio.iscoroutinefunction(obj):
-            raise NotImplementedError
+        elif asyncio.iscoroutinefunction(obj) and loop is None:
+            raise NotImplementedError(
+                "Interlude {0!r} is a coroutine function. "
+                "Use turberfield.dialogue.player.arehearse to await it.".format(obj)
+            )
         elif isinstance(obj, MutableSequence):
             yield self.handle_references(obj)
         elif (obj is None or isinstance(obj, Callable)) and len(args) == 3:
@@ -329,35 +375,69 @@ class TerminalHandler:
             yield obj
 
 class CGIHandler(TerminalHandler):
+    """
+    A handler which delivers events from scene script files as a stream of
+    server-sent events.
+
+    It takes the same arguments as
+    :py:class:`~turberfield.dialogue.handlers.TerminalHandler`, and one more:
+
+    :param scheduler: An optional
+        :py:class:`~turberfield.dialogue.scheduler.Scheduler` object.
+        If supplied, output is queued with it to be released on time,
+        and the handler itself never waits.
+
+    """
+
+    def __init__(self, *args, scheduler=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.scheduler = scheduler
+
+    def emit(self, *lines):
+        """Write an event to the stream, or queue it with the scheduler.
+
+        :param lines: The lines of text which make up the event.
+
+        """
+        text = "\n".join(lines) + "\n"
+        if self.scheduler is None:
+            self.terminal.stream.write(text)
+            self.terminal.stream.flush()
+        else:
+            self.scheduler.put(self.terminal.stream, text)
+
+    def wait(self, interval, obj=None):
+        """Pause the performance, or delay the next event from the scheduler.
+
+        :param float interval: The time in seconds to pause.
+        :param obj: The event which is the cause of the pause.
+
+        """
+        if self.scheduler is None:
+            super().wait(interval, obj)
+        else:
+            self.scheduler.pause(self.terminal.stream, interval)
 
     def handle_audio(self, obj):
         path = pkg_resources.resource_filename(obj.package, obj.resource)
         pos = path.find("lib", len(sys.prefix))
         if pos != -1:
-            print(
+            self.emit(
                 "event: audio",
-                "data: ../{0}\n".format(path[pos:]),
-                sep="\n",
-                end="\n",
-                file=self.terminal.stream
+                "data: ../{0}\n".format(path[pos:])
             )
-            self.terminal.stream.flush()
         return obj
 
     def handle_line(self, obj):
         if obj.persona is None:
             return obj
 
-        print(
+        self.emit(
             "event: line",
-            "data: {0}\n".format(Assembly.dumps(obj)),
-            sep="\n",
-            end="\n",
-            file=self.terminal.stream
+            "data: {0}\n".format(Assembly.dumps(obj))
         )
-        self.terminal.stream.flush()
         interval = self.pause + self.dwell * obj.text.count(" ")
-        time.sleep(interval)
+        self.wait(interval, obj)
         return obj
 
     def handle_property(self, obj):
@@ -370,19 +450,15 @@ class CGIHandler(TerminalHandler):
             except AttributeError as e:
                 self.log.error(". ".join(getattr(e, "args", e) or e))
 
-            print(
+            self.emit(
                 "event: property",
-                "data: {0}\n".format(Assembly.dumps(obj)),
-                sep="\n",
-                end="\n",
-                file=self.terminal.stream
+                "data: {0}\n".format(Assembly.dumps(obj))
             )
-            self.terminal.stream.flush()
-        time.sleep(self.pause)
+        self.wait(self.pause, obj)
         return obj
 
     def handle_scene(self, obj):
-        time.sleep(self.pause)
+        self.wait(self.pause, obj)
         return obj
 
     def handle_scenescript(self, obj):
@@ -19,6 +19,12 @@
 import bisect
 from collections.abc import Mapping
 import numbers
+import operator
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 
 class Matcher:
@@ -64,8 +70,84 @@ class Matcher:
         :param folders: A sequence of
             :py:class:`turberfield.dialogue.model.SceneScript.Folder` objects.
         """
-        self.folders = sorted(folders or [], key=lambda x: self.mapping_key(x.metadata))
-        self.keys = sorted([self.mapping_key(i.metadata) for i in self.folders])
+        pairs = sorted(
+            ((self.mapping_key(i.metadata), i) for i in folders or []),
+            key=operator.itemgetter(0)
+        )
+        self.folders = [folder for key, folder in pairs]
+        self.keys = [key for key, folder in pairs]
+        self.index = {}
+        for key, folder in pairs:
+            try:
+                self.index.setdefault(tuple(key), folder)
+            except TypeError:
+                # Metadata contains an unhashable value
+                continue
+
+    def add(self, folder):
+        """Add a folder to the matcher.
+
+        The folder goes after any others with the same metadata, just where
+        it would be had it been passed to the constructor.
+
+        :param folder: A
+            :py:class:`turberfield.dialogue.model.SceneScript.Folder` object.
+        :return: The position of the folder in the matcher.
+
+        """
+        key = self.mapping_key(folder.metadata)
+        n = bisect.bisect_right(self.keys, key)
+        self.keys.insert(n, key)
+        self.folders.insert(n, folder)
+        try:
+            self.index.setdefault(tuple(key), folder)
+        except TypeError:
+            # Metadata contains an unhashable value
+            pass
+        return n
+
+    def remove(self, folder):
+        """Remove a folder from the matcher.
+
+        The metadata of the folder must not have changed since it was added.
+
+        :param folder: A
+            :py:class:`turberfield.dialogue.model.SceneScript.Folder` object.
+        :return: The position the folder had in the matcher.
+        :raises ValueError: If the folder is not in the matcher.
+
+        """
+        key = self.mapping_key(folder.metadata)
+        lo = bisect.bisect_left(self.keys, key)
+        hi = bisect.bisect_right(self.keys, key, lo=lo)
+        try:
+            n = next(i for i in range(lo, hi) if self.folders[i] == folder)
+        except StopIteration:
+            raise ValueError("Folder not in matcher")
+
+        del self.keys[n]
+        del self.folders[n]
+        try:
+            if hi - lo > 1:
+                self.index[tuple(key)] = self.folders[lo]
+            else:
+                del self.index[tuple(key)]
+        except TypeError:
+            # Metadata contains an unhashable value
+            pass
+        return n
+
+    def replace(self, old, new):
+        """Swap one folder for another.
+
+        :param old: The folder to remove.
+        :param new: The folder to add.
+        :return: The position of the new folder in the matcher.
+        :raises ValueError: If the old folder is not in the matcher.
+
+        """
+        self.remove(old)
+        return self.add(new)
 
     def options(self, data):
         """Generate folders to best match metadata.
@@ -79,9 +161,184 @@ class Matcher:
         :py:class:`turberfield.dialogue.model.SceneScript.Folder` objects.
 
         """
-        if self.mapping_key(data) in self.keys:
-            yield next(i for i in self.folders if i.metadata == data)
+        key = self.mapping_key(data)
+        try:
+            yield self.index[tuple(key)]
+            return
+        except (KeyError, TypeError):
+            pass
+
+        index = bisect.bisect_left(self.keys, key)
+        if index < len(self.keys) and self.keys[index] == key:
+            # An exact match which could not be hashed
+            yield self.folders[index]
         else:
-            index = bisect.bisect_left(self.keys, self.mapping_key(data))
-            posns = sorted(set([max(0, index - 1), index]))
+            posns = [i for i in (index - 1, index) if 0 <= i < len(self.folders)]
             yield from (self.folders[i] for i in posns)
+
+
+class FeatureMatcher(Matcher):
+    """Match Turberfield Folders by the distance between their metadata.
+
+    Each numeric value in the metadata of a folder becomes one coordinate of
+    a point. So does the value of an enum, where that is a number. Complex
+    numbers contribute their magnitude. Any other value is treated as a
+    category; it adds a coordinate which is 1 where that value is present
+    and 0 elsewhere. A folder which lacks a coordinate has 0 there.
+
+    The coordinates of all folders are kept in a NumPy array, so a query
+    needs only a single vectorized calculation however many folders there are.
+    If NumPy is not installed, the results are those of
+    :py:class:`~turberfield.dialogue.matcher.Matcher`.
+
+    :param folders: A sequence of
+        :py:class:`turberfield.dialogue.model.SceneScript.Folder` objects.
+
+    """
+
+    @staticmethod
+    def leaves(obj, path=()):
+        for k, v in obj.items():
+            if isinstance(v, Mapping):
+                yield from FeatureMatcher.leaves(v, path + (k,))
+            else:
+                yield path + (k,), v
+
+    @staticmethod
+    def coordinate(val):
+        """Find the number which represents a metadata value.
+
+        :return: A float, or `None` if the value is not numeric.
+
+        """
+        val = getattr(val, "value", val)
+        if isinstance(val, numbers.Real):
+            return float(val)
+        elif isinstance(val, numbers.Complex):
+            return abs(val)
+        else:
+            return None
+
+    @staticmethod
+    def features(obj):
+        """Express metadata as coordinates.
+
+        :param dict obj: Metadata, which may be nested.
+        :return: A dictionary of {dimension: number}. A dimension is the path
+            to a numeric value, or the path and value of a category.
+
+        """
+        rv = {}
+        for path, val in FeatureMatcher.leaves(obj or {}):
+            n = FeatureMatcher.coordinate(val)
+            if n is not None:
+                rv[path] = n
+            else:
+                try:
+                    rv[path + (val,)] = 1.0
+                except TypeError:
+                    # Unhashable values can't be categorised
+                    continue
+        return rv
+
+    def __init__(self, folders=None):
+        super().__init__(folders)
+        rows = [self.features(i.metadata) for i in self.folders]
+        self.dimensions = {}
+        for row in rows:
+            for k in row:
+                self.dimensions.setdefault(k, len(self.dimensions))
+
+        if numpy is None:
+            self.matrix = None
+        else:
+            self.matrix = self.array(rows)
+            self.norms = numpy.einsum("ij,ij->i", self.matrix, self.matrix)
+
+    def add(self, folder):
+        n = super().add(folder)
+        if self.matrix is not None:
+            row = self.features(folder.metadata)
+            for k in row:
+                self.dimensions.setdefault(k, len(self.dimensions))
+            extra = len(self.dimensions) - self.matrix.shape[1]
+            if extra:
+                self.matrix = numpy.pad(self.matrix, ((0, 0), (0, extra)))
+            point = self.array([row])
+            self.matrix = numpy.insert(self.matrix, n, point[0], axis=0)
+            self.norms = numpy.insert(self.norms, n, point[0] @ point[0])
+        return n
+
+    def remove(self, folder):
+        n = super().remove(folder)
+        if self.matrix is not None:
+            # A dimension is kept even when no folder uses it any more
+            self.matrix = numpy.delete(self.matrix, n, axis=0)
+            self.norms = numpy.delete(self.norms, n)
+        return n
+
+    def array(self, rows):
+        rv = numpy.zeros((len(rows), len(self.dimensions)))
+        for i, row in enumerate(rows):
+            for k, v in row.items():
+                try:
+                    rv[i, self.dimensions[k]] = v
+                except KeyError:
+                    # Not a dimension of any folder
+                    continue
+        return rv
+
+    def distances(self, queries):
+        """Calculate the squared distance from each query to every folder.
+
+        :param queries: A sequence of metadata dictionaries.
+        :return: A NumPy array with a row for each query and a column for
+            each folder.
+
+        """
+        points = self.array([self.features(i) for i in queries])
+        squares = numpy.einsum("ij,ij->i", points, points)[:, None]
+        rv = squares + self.norms - 2 * points @ self.matrix.T
+        return numpy.maximum(rv, 0)
+
+    def options(self, data):
+        """Generate folders to best match metadata.
+
+        The results will be a single, perfectly matched folder, or the two
+        folders nearest to an imperfect match, closest first.
+
+        :param dict data: metadata matching criteria.
+
+        This method is a generator. It yields
+        :py:class:`turberfield.dialogue.model.SceneScript.Folder` objects.
+
+        """
+        if self.matrix is None or not self.folders:
+            yield from super().options(data)
+            return
+
+        try:
+            yield self.index[tuple(self.mapping_key(data))]
+            return
+        except (KeyError, TypeError):
+            pass
+
+        rv = self.distances([data])[0]
+        yield from (self.folders[i] for i in numpy.argsort(rv, kind="stable")[:2])
+
+    def nearest(self, queries):
+        """Find the best match for each of many sets of metadata in one call.
+
+        :param queries: A sequence of metadata dictionaries, one per session.
+        :return: A list with the nearest
+            :py:class:`turberfield.dialogue.model.SceneScript.Folder` to each
+            query, or `None` where there are no folders.
+
+        """
+        queries = list(queries)
+        if self.matrix is None:
+            return [next(self.options(i), None) for i in queries]
+        elif not self.folders:
+            return [None] * len(queries)
+        else:
+            return [self.folders[i] for i in self.distances(queries).argmin(axis=1)]
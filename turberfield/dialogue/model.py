@@ -17,27 +17,38 @@
 # along with turberfield.  If not, see <http://www.gnu.org/licenses/>.
 
 
-from collections import defaultdict
 from collections import namedtuple
 from collections import OrderedDict
-import functools
-import html.entities
+import concurrent.futures
 import logging
 import mimetypes
-import operator
 import os.path
 import re
 import string
 import sys
 import warnings
 
+from turberfield.dialogue import events
+from turberfield.dialogue.cache import DocumentCache
+from turberfield.dialogue.compiled import Assignment
+from turberfield.dialogue.compiled import Cast
+from turberfield.dialogue.compiled import CompiledScript
+from turberfield.dialogue.compiled import Conversion
+from turberfield.dialogue.compiled import Entity
+from turberfield.dialogue.compiled import escape
+from turberfield.dialogue.compiled import escape_table
+from turberfield.dialogue.compiled import Fragments
+from turberfield.dialogue.compiled import Placeholder
+from turberfield.dialogue.compiled import Predicate
+from turberfield.dialogue.compiled import Reference
+from turberfield.dialogue.compiled import Substitution
+from turberfield.dialogue.compiled import Template
 from turberfield.dialogue.directives import Condition as ConditionDirective
 from turberfield.dialogue.directives import Entity as EntityDirective
 from turberfield.dialogue.directives import FX as FXDirective
-from turberfield.dialogue.directives import Pathfinder
 from turberfield.dialogue.directives import Property as PropertyDirective
 from turberfield.dialogue.directives import Memory as MemoryDirective
-from turberfield.utils.assembly import Assembly
+from turberfield.dialogue.pathfinder import Pathfinder
 from turberfield.utils.misc import group_by_type
 from turberfield.utils.logger import LogManager
 
@@ -52,50 +63,56 @@ from docutils.nodes import footnote_reference
 from docutils.nodes import list_item
 
 
-
 class Model(docutils.nodes.GenericNodeVisitor):
     """This class registers the necessary extensions to the docutils document model.
 
     It also defines the types which are returned on iterating over a scene script file.
 
+    The model is compiled independently of the cast. Entity references and
+    substitutions are recorded as placeholders, which are resolved against
+    the cast as the model is iterated.
+
+    :param str fP: The path to the scene script file.
+    :param document: The docutils document to walk.
+    :param personae: A dictionary of {name: persona} for each entity cast.
+    :param bool markup: If `False`, no HTML is generated. The `html` field of
+        each event is then `None`.
+
     """
 
-    Shot = namedtuple("Shot", ["name", "scene", "items", "path", "line_nr"], defaults=(None, None))
-    Property = namedtuple(
-        "Property",
-        ["entity", "object", "attr", "val", "path", "line_nr"],
-        defaults=(None, None)
-    )
-    Audio = namedtuple(
-        "Audio",
-        ["package", "resource", "offset", "duration", "loop", "path", "line_nr"],
-        defaults=(None, None)
-    )
-    Still = namedtuple(
-        "Still",
-        list(Audio._fields[:-2]) + ["label", "width", "height", "path", "line_nr"],
-        defaults=(None, None)
-    )
-    Video = namedtuple(
-        "Video",
-        list(Still._fields[:-2]) + ["poster", "url", "path", "line_nr"],
-        defaults=(None, None)
-    )
-    Memory = namedtuple(
-        "Memory",
-        ["subject", "object", "state", "text", "html", "path", "line_nr"],
-        defaults=(None, None)
-    )
-    Line = namedtuple("Line", ["persona", "text", "html", "path", "line_nr"], defaults=(None, None))
-    Condition = namedtuple(
-        "Condition",
-        ["object", "format", "regex", "value", "path", "line_nr"],
-        defaults=(None, None)
-    )
+    Shot = events.Shot
+    Property = events.Property
+    Audio = events.Audio
+    Still = events.Still
+    Video = events.Video
+    Memory = events.Memory
+    Line = events.Line
+    Condition = events.Condition
+
+    escape_table = escape_table
+
+    log = None
+
+    @staticmethod
+    def routed(log, level):
+        """Find out whether a logger sends messages of a given level anywhere.
+
+        :param log: A :py:class:`turberfield.utils.logger.Logger` object.
+        :param level: A member of `Logger.Level`.
+        :return: `True` if any route of the logger accepts messages at `level`.
 
-    def __init__(self, fP, document):
+        """
+        return any(
+            route.level.value <= level.value
+            for pair, routes in log.manager.pairings if pair.logger_name == log.name
+            for route in routes
+        )
+
+    def __init__(self, fP, document, personae=None, markup=True):
         super().__init__(document)
         self.fP = fP
+        self.markup = markup
+        self.definitions = dict(document.substitution_defs)
         self.optional = tuple(
             i.__name__ for i in (
                 EntityDirective.Declaration, MemoryDirective.Definition,
@@ -103,75 +120,330 @@ class Model(docutils.nodes.GenericNodeVisitor):
                 FXDirective.Cue, ConditionDirective.Evaluation
             )
         )
-        self.log_manager = LogManager()
-        self.log = self.log_manager.clone(
-            self.log_manager.get_logger("main"), "turberfield.dialogue.model"
-        )
-        self.log.frame = [
-            "{now}", "{level.name:>8}", "{logger.name}",
-            "{1[path]}", "{1[line_nr]:>5}", " {0:<64}", " {token}"
-        ]
+        if Model.log is None:
+            log_manager = LogManager()
+            Model.log = log_manager.clone(
+                log_manager.get_logger("main"), "turberfield.dialogue.model"
+            )
+            Model.log.frame = [
+                "{now}", "{level.name:>8}", "{logger.name}",
+                "{1[path]}", "{1[line_nr]:>5}", " {0:<64}", " {token}"
+            ]
+        CompiledScript.follow(Model.log)
+        self.log_manager = self.log.manager
+        self.debugging = self.routed(self.log, self.log.Level.DEBUG)
 
         self.section_level = 0
         self.scenes = [None]
         self.shots = [Model.Shot(None, None, [])]
         self.speaker = None
         self.memory = None
-        self.metadata = []
-        self.escape_table = str.maketrans({
-            v: "&" + k for k, v in html.entities.html5.items()
-            if k.endswith(";") and len(v) == 1
-            and v not in "!\"#'()*+,-..:;=@{}~"
-        })
+        self.fields = []
+        self.entities = [
+            i for i in document.children if isinstance(i, EntityDirective.Declaration)
+        ] + [
+            i for i in document.citations if not isinstance(i, EntityDirective.Declaration)
+        ]
+        self.index = {}
+        for entity in self.entities:
+            for name in entity.attributes["names"]:
+                self.index.setdefault(name, entity)
+        self.personae = dict(personae or {})
         self.text = []
         self.html = []
+        self.getters = {}
+        self.fragments = {}
+        self.lookups = OrderedDict()
+        self.cast = Cast(self, self.personae)
+        self.streaming = False
+        self.cursor = 0
+        self.target = None
+        self.skipping = False
 
     def __iter__(self):
-        for shot in self.shots:
-            for item in shot.items:
-                yield shot, item
+        if self.streaming:
+            return self.stream()
+        else:
+            return iter(self.cast)
+
+    def traverse(self, node):
+        """Visit a node and its children, as does :py:meth:`docutils.nodes.Node.walkabout`.
+
+        This method is a generator. It yields after each visit and departure.
+
+        """
+        call_depart = True
+        stop = False
+        try:
+            try:
+                self.dispatch_visit(node)
+            except docutils.nodes.SkipNode:
+                return stop
+            except docutils.nodes.SkipDeparture:
+                call_depart = False
+            yield
+
+            try:
+                for child in node.children[:]:
+                    if (yield from self.traverse(child)):
+                        stop = True
+                        break
+            except docutils.nodes.SkipSiblings:
+                pass
+        except docutils.nodes.StopTraversal:
+            stop = True
+
+        if call_depart:
+            self.dispatch_departure(node)
+            yield
+        return stop
+
+    def flush(self, cast, final=False):
+        # The most recent item may yet be amended by a raw directive
+        while self.cursor < len(self.shots):
+            shot = self.shots[self.cursor]
+            last = self.cursor == len(self.shots) - 1
+            n = len(shot.items) if final or not last else len(shot.items) - 1
+            items = shot.items[:n]
+            del shot.items[:n]
+            if self.target is not None and self.target == (shot.scene, shot.name):
+                self.target = None
+
+            if self.target is None:
+                for item in items:
+                    if self.skipping and not isinstance(item, Model.Condition):
+                        continue
+                    self.skipping = False
+                    item = cast.bind(item)
+                    if item is not None:
+                        yield shot, item
+
+            if last:
+                break
+            self.cursor += 1
+            self.skipping = False
+
+    def stream(self):
+        """Walk the document, generating each item as soon as it is complete.
+
+        Items are not kept in :py:attr:`shots` once they have been generated.
+
+        The cast is primed before the walk begins, as it is for a model
+        which is not streamed. So each substitution, and each property
+        setter whose value is the attribute of another entity, reads the
+        value that attribute had when the performance began.
+
+        This method is a generator. It yields (shot, item) pairs.
+
+        """
+        for defn in self.definitions.values():
+            for tgt in defn.children:
+                if isinstance(tgt, PropertyDirective.Getter):
+                    ref, dot, attr = tgt["arguments"][0].partition(".")
+                    entity = self.get_entity(ref)
+                    if isinstance(entity, EntityDirective.Declaration):
+                        self.lookup(entity["names"][0], attr)
+
+        # Node.findall is new in docutils 0.18
+        findall = getattr(self.document, "findall", self.document.traverse)
+        for node in findall(PropertyDirective.Setter):
+            ref, dot, attr = node["arguments"][1].partition(".")
+            entity = self.get_entity(ref)
+            if attr and isinstance(entity, EntityDirective.Declaration):
+                self.lookup(entity["names"][0], attr)
+        self.cast.prime()
+
+        for _ in self.traverse(self.document):
+            yield from self.flush(self.cast)
+        yield from self.flush(self.cast, final=True)
+        if self.target is not None:
+            raise KeyError(self.target)
+
+    @property
+    def metadata(self):
+        return self.cast.metadata
+
+    @property
+    def shot_index(self):
+        """An OrderedDict of {(scene, shot): offset} for the shots of the script.
+
+        A streaming model has only those shots it has walked so far.
+
+        """
+        return CompiledScript.index(self.shots)
+
+    @property
+    def condition_index(self):
+        """The offsets of the conditions in each shot.
+
+        See :py:meth:`~turberfield.dialogue.compiled.CompiledScript.conditions`.
+
+        """
+        return CompiledScript.conditions(self.shots)
+
+    def skip(self):
+        """Skip the items which follow the most recent one in its shot.
+
+        Iteration resumes at the next condition of the shot, or else
+        at the start of the next shot. Skipped items are not bound.
+
+        """
+        if self.streaming:
+            self.skipping = True
+        else:
+            self.cast.skip()
+
+    def seek(self, scene, shot):
+        """Begin iteration at a given shot.
+
+        Earlier shots generate no events. A streaming model must still walk
+        the document up to that shot, but binds none of the items it skips.
+
+        :param str scene: The name of the scene.
+        :param str shot: The name of the shot.
+        :raises KeyError: If the script has no such shot. A streaming model
+            raises it only once the document has been walked.
+        :return: This object.
+
+        """
+        if self.streaming:
+            self.target = (scene, shot)
+        else:
+            self.cast.seek(scene, shot)
+        return self
+
+    @staticmethod
+    def join(parts, sep=""):
+        if all(isinstance(i, str) for i in parts):
+            return sep.join(parts)
+        else:
+            return Fragments(tuple(parts), sep)
+
+    def add_text(self, text):
+        prior = self.text[-1] if self.text else None
+        if isinstance(prior, str) and prior.endswith(tuple(string.whitespace)):
+            text = text.lstrip()
+        self.text.append(text)
+
+    def markup_html(self):
+        return self.join(self.html, "\n") if self.markup else None
 
     def close_shot(self, line_nr=None):
         if self.memory:
             self.shots[-1].items.append(
-                self.memory._replace(text="".join(self.text), html="\n".join(self.html))
+                self.memory._replace(text=self.join(self.text), html=self.markup_html())
             )
             self.memory = None
         elif self.text:
             self.shots[-1].items.append(
-                Model.Line(self.speaker, "".join(self.text), "\n".join(self.html), self.fP, line_nr)
+                Model.Line(
+                    self.speaker, self.join(self.text), self.markup_html(), self.fP, line_nr
+                )
             )
             self.text.clear()
             self.html.clear()
 
     def get_entity(self, ref):
-        return next((
-            entity
-            for entity in self.document.citations
-            if ref and ref.lower() in entity.attributes["names"]),
-            None)
+        return self.index.get(ref.lower()) if ref else None
+
+    def get_persona(self, entity, default=None):
+        """Return a placeholder for the persona to be cast as an entity."""
+        if isinstance(entity, EntityDirective.Declaration):
+            return Reference(entity["names"][0], default=default)
+        else:
+            return default
+
+    def lookup(self, name, attr):
+        """Note an attribute of a persona which the script refers to."""
+        self.lookups[(name, attr)] = None
+
+    def substitute_property(self, label, line=None):
+        try:
+            return self.getters[label]
+        except KeyError:
+            pass
 
-    def substitute_property(self, matchObj, line=None):
         try:
-            defn = self.document.substitution_defs[matchObj.group(1)]
+            defn = self.definitions[label]
             getter = next(
                 i for i in defn.children
                 if isinstance(i, PropertyDirective.Getter)
             )
             ref, dot, attr = getter["arguments"][0].partition(".")
             entity = self.get_entity(ref)
-            rv = str(operator.attrgetter(attr)(entity.persona)).strip()
-        except (AttributeError, KeyError, IndexError, StopIteration) as e:
+            if isinstance(entity, EntityDirective.Declaration):
+                name = entity["names"][0]
+                self.lookup(name, attr)
+                rv = self.getters[label] = Reference(name, attr, default="")
+                return rv
+        except (KeyError, IndexError, StopIteration) as e:
+            pass
+
+        self.log.warning(
+            "Argument has bad substitution reference",
+            {"path": self.fP, "line_nr": line},
+            token=label
+        )
+        rv = self.getters[label] = ""
+        return rv
+
+    def substitute_fragments(self, label, line=None):
+        try:
+            return self.fragments[label]
+        except KeyError:
+            pass
+
+        try:
+            defn = self.definitions[label]
+        except KeyError:
             self.log.warning(
-                "Argument has bad substitution reference",
+                "Bad substitution reference",
                 {"path": self.fP, "line_nr": line},
-                token=matchObj.group(1)
+                token="|{0}|".format(label)
             )
-            rv = None
+            rv = self.fragments[label] = ()
+            return rv
+
+        rv = []
+        for tgt in defn.children:
+            if isinstance(tgt, PropertyDirective.Getter):
+                ref, dot, attr = tgt["arguments"][0].partition(".")
+                entity = self.get_entity(ref)
+                if entity is None:
+                    obj = Pathfinder.string_import(
+                        tgt["arguments"][0], relative=False, sep=".",
+                        path=self.fP, line_nr=defn.line
+                    )
+                    if obj is not None:
+                        rv.append((str(obj).strip(), escape(str(obj).strip())))
+                elif isinstance(entity, EntityDirective.Declaration):
+                    name = entity["names"][0]
+                    self.lookup(name, attr)
+                    rv.append((
+                        Substitution(name, attr, html=False),
+                        Substitution(name, attr, html=True)
+                    ))
+            else:
+                text = defn.astext()
+                rv.append((text, '<span class="ref">{0}</span>'.format(escape(text))))
+
+        rv = self.fragments[label] = tuple(rv)
         return rv
 
+    def substitute_arguments(self, text, line=None):
+        slots = tuple(
+            (label, self.substitute_property(label, line=line))
+            for label in Template.regex.findall(text)
+        )
+        rv = Template(text, slots)
+        if any(isinstance(v, Placeholder) for k, v in slots):
+            return rv
+        else:
+            return rv.resolve(None)
+
     def default_visit(self, node):
-        self.log.debug(node, {"path": self.fP, "line_nr": node.line})
+        if self.debugging:
+            self.log.debug(node, {"path": self.fP, "line_nr": node.line})
 
     def default_departure(self, node):
         pass
@@ -180,17 +452,19 @@ class Model(docutils.nodes.GenericNodeVisitor):
         self.speaker = None
 
     def visit_bullet_list(self, node):
-        self.html.append("<ul>")
+        if self.markup:
+            self.html.append("<ul>")
 
     def depart_bullet_list(self, node):
-        self.html.append("</ul>")
+        if self.markup:
+            self.html.append("</ul>")
         self.close_shot(node.line)
 
     def visit_citation_reference(self, node):
         entity = self.get_entity(node.attributes["refname"])
-        try:
-            self.speaker = entity.persona
-        except AttributeError:
+        if isinstance(entity, EntityDirective.Declaration):
+            self.speaker = self.get_persona(entity, default=node.attributes["refname"])
+        else:
             self.log.warning(
                 "Reference to entity with no persona",
                 {"path": self.fP, "line_nr": node.parent.line},
@@ -199,17 +473,17 @@ class Model(docutils.nodes.GenericNodeVisitor):
             self.speaker = node.attributes["refname"]
 
     def visit_Cue(self, node):
-        subref_re = re.compile("\|(\w+)\|")
-        subber = functools.partial(self.substitute_property, line=node.parent.line)
         pkg = node["arguments"][0]
-        rsrc = subref_re.sub(subber, node["arguments"][1])
+        rsrc = self.substitute_arguments(node["arguments"][1], line=node.parent.line)
         offset = node["options"].get("offset")
         duration = node["options"].get("duration")
-        label = subref_re.sub(subber, node["options"].get("label", ""))
+        label = self.substitute_arguments(
+            node["options"].get("label", ""), line=node.parent.line
+        )
         loop = node["options"].get("loop")
         width = node["options"].get("width")
         height = node["options"].get("height")
-        typ = mimetypes.guess_type(rsrc)[0]
+        typ = mimetypes.guess_type(getattr(rsrc, "text", rsrc))[0]
         item = None
         try:
             if typ.startswith("audio"):
@@ -233,15 +507,14 @@ class Model(docutils.nodes.GenericNodeVisitor):
         subj = self.get_entity(node["options"].get("subject"))
         obj = self.get_entity(node["options"].get("object"))
         self.memory = Model.Memory(
-            subj and subj.persona, obj and obj.persona, state, None, None, self.fP, node.line
+            self.get_persona(subj), self.get_persona(obj), state, None, None, self.fP, node.line
         )
 
     def visit_emphasis(self, node):
         text = node.astext()
-        self.text.append(text.lstrip() if self.text and self.text[-1].endswith(tuple(string.whitespace)) else text)
-        self.html.append('<em class="text">{0}</em>'.format(
-            text.translate(self.escape_table)
-        ))
+        self.add_text(text)
+        if self.markup:
+            self.html.append('<em class="text">{0}</em>'.format(escape(text)))
 
     def visit_Evaluation(self, node):
         ref, dot, format_ = node["arguments"][0].partition(".")
@@ -260,30 +533,37 @@ class Model(docutils.nodes.GenericNodeVisitor):
                 )
 
         if not regex:
-            subber = functools.partial(self.substitute_property, line=node.line)
-            s = re.compile("\|(\w+)\|").sub(subber, pattern)
-            try:
-                value = int(s) if s.isdigit() else node.string_import(s)
-            except ValueError:
-                value = s
+            s = self.substitute_arguments(pattern, line=node.line)
+            if isinstance(s, Placeholder):
+                value = Conversion(s)
+            else:
+                value = Conversion.convert(s)
 
         self.shots[-1].items.append(
-            Model.Condition(entity.persona, format_, regex, value, self.fP, node.line)
+            Model.Condition(
+                self.get_persona(entity), format_, regex, value,
+                self.fP, node.line, Predicate(format_, regex)
+            )
         )
 
     def depart_field_name(self, node):
-        self.metadata.append((node.astext(), None))
+        self.fields.append((node.astext(), None))
 
     def depart_field_body(self, node):
-        name, _ = self.metadata.pop(-1)
+        name, _ = self.fields.pop(-1)
         if self.text:
-            self.metadata.append((name, " ".join(self.text)))
+            self.fields.append((name, self.join(self.text, " ")))
         self.text.clear()
 
     def depart_footnote_reference(self, node):
+        if not self.markup:
+            return
+
         try:
             span = self.html.pop(-1)
-            self.html.append(span.replace('class="text"','class="call"'))
+            self.html.append(
+                span.replace('class="text"','class="call"') if isinstance(span, str) else span
+            )
         except InderError:
             self.log.warning(
                 "Unable to process footnote callout",
@@ -292,58 +572,67 @@ class Model(docutils.nodes.GenericNodeVisitor):
 
     def visit_footnote(self, node):
         self.text = []
-        self.html.append('<span class="footnote" role="note">')
+        if self.markup:
+            self.html.append('<span class="footnote" role="note">')
 
     def depart_footnote(self, node):
-        try:
-            for n, span in enumerate(self.html.copy()):
-                if '<span class="text">' in span:
-                    self.html[n] = span.replace('<span class="text">', "").replace("</span>", "")
-        except InderError:
-            self.log.warning(
-                "Unable to process footnote",
-                {"path": self.fP, "line_nr": node.line},
-            )
-        self.html.append("</span>")
-        self.html.append("</p>\n")
+        if self.markup:
+            try:
+                for n, span in enumerate(self.html.copy()):
+                    if '<span class="text">' in span:
+                        self.html[n] = span.replace(
+                            '<span class="text">', ""
+                        ).replace("</span>", "")
+            except InderError:
+                self.log.warning(
+                    "Unable to process footnote",
+                    {"path": self.fP, "line_nr": node.line},
+                )
+            self.html.append("</span>")
+            self.html.append("</p>\n")
         self.close_shot(node.line)
 
     def visit_list_item(self, node):
-        self.html.append("<li>")
+        if self.markup:
+            self.html.append("<li>")
 
     def depart_list_item(self, node):
-        self.html.append("</li>")
+        if self.markup:
+            self.html.append("</li>")
         self.text.append("\n")
 
     def visit_literal(self, node):
         text = node.astext()
-        self.text.append(text.lstrip() if self.text and self.text[-1].endswith(tuple(string.whitespace)) else text)
-        self.html.append('<pre class="text">{0}</pre>'.format(
-            text.translate(self.escape_table)
-        ))
+        self.add_text(text)
+        if self.markup:
+            self.html.append('<pre class="text">{0}</pre>'.format(escape(text)))
 
     def visit_paragraph(self, node):
         if self.shots and not isinstance(node.parent, (citation, field_body, footnote, list_item)):
             self.text = []
-            self.html = ["<p>"]
+            self.html = ["<p>"] if self.markup else []
 
     def depart_paragraph(self, node):
         if any(isinstance(i, footnote_reference) for i in node.children):
-            self.log.debug(
-                "Not closing after footnote reference",
-                {"path": self.fP, "line_nr": node.line},
-            )
+            if self.debugging:
+                self.log.debug(
+                    "Not closing after footnote reference",
+                    {"path": self.fP, "line_nr": node.line},
+                )
             return
 
         if self.shots and not isinstance(node.parent, (citation, field_body, footnote, list_item)):
-            self.html.append("</p>\n")
+            if self.markup:
+                self.html.append("</p>\n")
             self.close_shot(node.line)
 
     def depart_raw(self, node):
-        if "html" in node.attributes["format"] and self.shots:
+        if self.markup and "html" in node.attributes["format"] and self.shots:
             if self.shots[-1].items:
                 line = self.shots[-1].items[-1]
-                self.shots[-1].items[-1] = line._replace(html=line.html + "\n" + node.astext())
+                self.shots[-1].items[-1] = line._replace(
+                    html=self.join([line.html, node.astext()], "\n")
+                )
             else:
                 self.shots[-1].items.append(
                     Model.Line(None, "", node.astext(), self.fP, node.line)
@@ -357,11 +646,9 @@ class Model(docutils.nodes.GenericNodeVisitor):
         else:
             ref_uri = node["refuri"]
         text = node.astext()
-        self.text.append(text.lstrip() if self.text and self.text[-1].endswith(tuple(string.whitespace)) else text)
-        self.html.append('<a href="{0}">{1}</a>'.format(
-            ref_uri,
-            text.translate(self.escape_table)
-        ))
+        self.add_text(text)
+        if self.markup:
+            self.html.append('<a href="{0}">{1}</a>'.format(ref_uri, escape(text)))
 
     def visit_section(self, node):
         self.section_level += 1
@@ -372,102 +659,63 @@ class Model(docutils.nodes.GenericNodeVisitor):
     def visit_Setter(self, node):
         ref, attr = node["arguments"][0].split(".")
         entity = self.get_entity(ref)
+        if not isinstance(entity, EntityDirective.Declaration):
+            warnings.warn(
+                "Line {0.parent.line}: "
+                "Entity has no persona ({1}).".format(node, entity)
+            )
+            return
 
-        subber = functools.partial(self.substitute_property, line=node.line)
-        s = re.compile("\|(\w+)\|").sub(subber, node["arguments"][1])
-        try:
+        s = self.substitute_arguments(node["arguments"][1], line=node.line)
+        if isinstance(s, Placeholder):
+            val = Assignment(s)
+        else:
             # Attempt objectwise assignment if RHS is an entity
             bits = s.partition(".")
             donor = self.get_entity(bits[0])
-            val = operator.attrgetter(bits[2])(donor.persona) if bits[2] else donor.persona
-            self.shots[-1].items.append(
-                Model.Property(self.speaker, entity.persona, attr, val, self.fP, node.line)
-            )
-        except AttributeError:
-            pass
-        else:
-            return
-
-        try:
-            val = int(s) if s.isdigit() else node.string_import(s)
-        except ValueError:
-            val = s
+            val = self.get_persona(donor, default=Conversion(s))
+            if isinstance(val, Reference):
+                val = val._replace(attr=bits[2])
+                if val.attr:
+                    self.lookup(val.name, val.attr)
+            else:
+                val = Conversion.convert(s)
 
-        try:
-            self.shots[-1].items.append(
-                Model.Property(self.speaker, entity.persona, attr, val, self.fP, node.line)
-            )
-        except AttributeError:
-            warnings.warn(
-                "Line {0.parent.line}: "
-                "Entity has no persona ({1}).".format(node, entity)
-            )
+        self.shots[-1].items.append(
+            Model.Property(self.speaker, self.get_persona(entity), attr, val, self.fP, node.line)
+        )
 
     def visit_strong(self, node):
         text = node.astext()
-        self.text.append(text.lstrip() if self.text and self.text[-1].endswith(tuple(string.whitespace)) else text)
-        self.html.append('<strong class="text">{0}</strong>'.format(
-            text.translate(self.escape_table)
-        ))
+        self.add_text(text)
+        if self.markup:
+            self.html.append('<strong class="text">{0}</strong>'.format(escape(text)))
 
     def visit_substitution_definition(self, node):
         label = re.compile("\|(\w+)\|").search(node.rawsource)
         if label:
-            self.document.substitution_defs[label.group(1)] = node
+            self.definitions[label.group(1)] = node
 
     def visit_substitution_reference(self, node):
-        try:
-            defn = self.document.substitution_defs[node.attributes["refname"]]
-        except KeyError:
-            self.log.warning(
-                "Bad substitution reference",
-                {"path": self.fP, "line_nr": node.line},
-                token=node.rawsource
-            )
-            return
-
-        for tgt in defn.children:
-            if isinstance(tgt, PropertyDirective.Getter):
-                ref, dot, attr = tgt["arguments"][0].partition(".")
-                entity = self.get_entity(ref)
-                if entity is None:
-                    obj = Pathfinder.string_import(
-                        tgt["arguments"][0], relative=False, sep=".",
-                        path=self.fP, line_nr=defn.line
-                    )
-                    if obj is not None:
-                        self.text.append(str(obj).strip())
-                        self.html.append(
-                            str(obj).strip().translate(self.escape_table)
-                        )
-                elif getattr(entity, "persona", None) is not None:
-                    fmt = "".join(("{0.", attr, "}"))
-                    val = fmt.format(entity.persona)
-                    self.text.append(val.strip())
-                    self.html.append('<span class="ref">{0}</span>'.format(
-                        val.translate(self.escape_table)
-                    ))
-            else:
-                text = defn.astext()
-                self.text.append(text)
-                self.html.append('<span class="ref">{0}</span>'.format(
-                    text.translate(self.escape_table)
-                ))
+        for text, html in self.substitute_fragments(node.attributes["refname"], line=node.line):
+            self.text.append(text)
+            if self.markup:
+                self.html.append(html)
 
     def visit_Text(self, node):
         if isinstance(node.parent, docutils.nodes.paragraph):
             text = node.astext()
-            self.text.append(text.lstrip() if self.text and self.text[-1].endswith(tuple(string.whitespace)) else text)
-            self.html.append('<span class="text">{0}</span>'.format(
-                text.translate(self.escape_table)
-            ))
+            self.add_text(text)
+            if self.markup:
+                self.html.append('<span class="text">{0}</span>'.format(escape(text)))
 
     def visit_title(self, node):
-        self.log.debug(
-            "Title level {0.section_level}".format(self),
-            {"path": self.fP, "line_nr": node.line},
-            token=node.rawsource,
-        )
+        if self.debugging:
+            self.log.debug(
+                "Title level {0.section_level}".format(self),
+                {"path": self.fP, "line_nr": node.line},
+                token=node.rawsource,
+            )
         if self.scenes == [None] and self.shots == [Model.Shot(None, None, [])]:
             self.scenes.clear()
             self.shots.clear()
@@ -496,6 +744,22 @@ class SceneScript:
 
     Folder = namedtuple("Folder", ["pkg", "description", "metadata", "paths", "interludes"])
 
+    #: An optional :py:class:`~turberfield.dialogue.cache.DocumentCache` object.
+    #: When set, parsed documents are stored there and reused.
+    cache = None
+
+    #: The entities declared in each scene script file, keyed by path.
+    #: See :py:meth:`~turberfield.dialogue.model.SceneScript.manifest`.
+    manifests = OrderedDict()
+
+    #: Parsed documents shared by all scene scripts, keyed by path.
+    #: See :py:meth:`~turberfield.dialogue.model.SceneScript.warm`.
+    documents = OrderedDict()
+
+    #: The number of entries kept in each of those caches. The least
+    #: recently used entry is discarded first.
+    limit = 256
+
     settings = Values(defaults=dict(
         character_level_inline_markup=False,
         debug=False, error_encoding="utf-8",
@@ -507,6 +771,8 @@ class SceneScript:
         warning_stream=sys.stderr,
         raw_enabled=True,
         file_insertion_enabled=True,
+        record_dependencies=docutils.utils.DependencyList(),
+        root_prefix="/",
         input_encoding="utf-8",
         input_encoding_error_handler="replace",
         line_length_limit=float("inf"),
@@ -550,11 +816,7 @@ class SceneScript:
         The method generates a sequence of
         :py:class:`~turberfield.dialogue.model.SceneScript` objects.
         """
-        log_manager = LogManager()
-        log = log_manager.clone(
-            log_manager.get_logger("main"),
-            "turberfield.dialogue.model.scenescript"
-        )
+        log = CompiledScript.logger()
 
         for path in paths:
             try:
@@ -577,123 +839,244 @@ class SceneScript:
         """Read a block of text as a docutils document.
 
         :param str text: Scene script text.
-        :param str name: An optional name for the document.
+        :param str name: An optional name for the document. This is the path
+            to the script file, from which any included files are found.
         :return: A document object.
 
+        If :py:attr:`SceneScript.cache` is set, a previously parsed copy of
+        the same text is returned from there instead.
+
         """
+        cache = SceneScript.cache
+        if cache is not None:
+            key = cache.key(text, name)
+            doc = cache.get(key, SceneScript.settings)
+            if doc is not None:
+                return doc
+
         doc = docutils.utils.new_document(name, SceneScript.settings)
         parser = docutils.parsers.rst.Parser()
         parser.parse(text, doc)
+
+        if cache is not None:
+            cache.put(key, doc)
         return doc
 
-    def __init__(self, fP, metadata=None, doc=None):
-        self.log_manager = LogManager()
-        self.log = self.log_manager.get_logger(
-            "turberfield.dialogue.model.scenescript"
+    @staticmethod
+    def stamp(fP):
+        """Identify the current version of a file from its modification time and size."""
+        stat = os.stat(fP)
+        return (stat.st_mtime_ns, stat.st_size)
+
+    @staticmethod
+    def prepare(fP):
+        """Parse and compile a scene script file.
+
+        This is the work done by each process in
+        :py:meth:`~turberfield.dialogue.model.SceneScript.warm`.
+
+        :return: A tuple of (path, stamp, document, compiled script).
+            The document is pickled.
+
+        """
+        stamp = SceneScript.stamp(fP)
+        with SceneScript(fP) as script:
+            return (fP, stamp, DocumentCache.dumps(script.doc), script.compile())
+
+    @classmethod
+    def remember(cls, cache, key, value):
+        """Store a value in one of the shared caches.
+
+        :param cache: Either :py:attr:`~turberfield.dialogue.model.SceneScript.documents`
+            or :py:attr:`~turberfield.dialogue.model.SceneScript.manifests`.
+        :param key: The path to a scene script file.
+        :param value: The value to store.
+        :return: The value.
+
+        The oldest entries are discarded so that the cache holds no more than
+        :py:attr:`~turberfield.dialogue.model.SceneScript.limit` of them.
+
+        """
+        cache[key] = value
+        cache.move_to_end(key)
+        while len(cache) > cls.limit:
+            cache.popitem(last=False)
+        return value
+
+    @classmethod
+    def warm(cls, folders, executor=None, processes=None):
+        """Parse all the scene scripts of some folders in parallel.
+
+        The parsed documents are stored in
+        :py:attr:`~turberfield.dialogue.model.SceneScript.documents` and
+        their entities in
+        :py:attr:`~turberfield.dialogue.model.SceneScript.manifests`.
+        Scene scripts use them until the file is modified.
+
+        :param folders: A sequence of
+            :py:class:`~turberfield.dialogue.model.SceneScript.Folder` objects.
+        :param executor: An optional :py:class:`concurrent.futures.Executor`.
+            By default a process pool is created for the purpose.
+        :param int processes: The number of processes in the default pool.
+            If omitted, one for each CPU.
+        :return: An OrderedDict of {path: CompiledScript}.
+
+        """
+        log = CompiledScript.logger()
+        paths = list(OrderedDict.fromkeys(
+            script.fP for folder in folders for script in cls.scripts(**folder._asdict())
+        ))
+
+        pool = executor or concurrent.futures.ProcessPoolExecutor(max_workers=processes)
+        try:
+            jobs = [pool.submit(cls.prepare, fP) for fP in paths]
+            rv = OrderedDict()
+            for job in jobs:
+                try:
+                    fP, stamp, data, compiled = job.result()
+                except Exception as e:
+                    log.warning("Unable to prepare script", exception=e)
+                    continue
+
+                doc = DocumentCache.loads(data, cls.settings)
+                cls.remember(cls.documents, fP, (stamp, doc))
+                cls.remember(cls.manifests, fP, (stamp, compiled.entities))
+                rv[fP] = compiled
+            return rv
+        finally:
+            if executor is None:
+                pool.shutdown()
+
+    @classmethod
+    def manifest(cls, fP):
+        """Find the entities declared in a scene script file.
+
+        :param str fP: The path to the scene script file.
+        :return: A tuple of :py:class:`~turberfield.dialogue.compiled.Entity` objects.
+
+        The file is parsed only the first time it is seen, or when it has
+        been modified since. The result is enough to check whether the script
+        can be cast; see
+        :py:meth:`~turberfield.dialogue.compiled.CompiledScript.choose`.
+        The parsed document is kept in
+        :py:attr:`~turberfield.dialogue.model.SceneScript.documents`, so that
+        the script is not parsed again when it is performed.
+
+        """
+        stamp = cls.stamp(fP)
+        try:
+            prior, rv = cls.manifests[fP]
+            if prior == stamp:
+                cls.manifests.move_to_end(fP)
+                return rv
+        except KeyError:
+            pass
+
+        with open(fP, "r") as script:
+            doc = cls.read(script.read(), fP)
+        cls.remember(cls.documents, fP, (stamp, doc))
+        rv = tuple(
+            Entity.declared(i) for i in group_by_type(doc)[EntityDirective.Declaration]
         )
+        cls.remember(cls.manifests, fP, (stamp, rv))
+        return rv
+
+    def __init__(self, fP, metadata=None, doc=None):
+        self.log = CompiledScript.logger()
+        self.log_manager = self.log.manager
         self.fP = fP
         self.metadata = metadata
         self.doc = doc
+        self.personae = {}
 
     def __enter__(self):
+        if self.fP in SceneScript.documents:
+            stamp, doc = SceneScript.documents[self.fP]
+            if stamp == self.stamp(self.fP):
+                SceneScript.documents.move_to_end(self.fP)
+                self.doc = doc
+                return self
+
         with open(self.fP, "r") as script:
-            self.doc = self.read(script.read())
+            self.doc = self.read(script.read(), self.fP)
         return self
 
     def __exit__(self, exc_type, exc_value, traceback):
         return False
 
-    def select(self, personae, relative=False, roles=1):
+    def select(self, personae, relative=False, roles=1, optimal=False):
         """Select a persona for each entity declared in the scene.
 
         :param personae: A sequence of Personae.
         :param bool relative: Affects imports from namespace packages.
             Used for testing only.
         :param int roles: The maximum number of roles allocated to each persona.
+        :param bool optimal: Solve the casting as a matching problem. See
+            :py:meth:`~turberfield.dialogue.compiled.CompiledScript.match`.
         :return: An OrderedDict of {Entity: Persona}.
 
         """
-
-        def constrained(entity):
-            return (
-                len(entity["options"].get("types", [])) +
-                len(entity["options"].get("states", []))
-            )
-
-        rv = OrderedDict()
-        performing = defaultdict(set)
-        pool = list(personae)
-        self.log.debug(pool, {"path": self.fP})
         entities = OrderedDict([
-            ("".join(entity.attributes["names"]), entity)
-            for entity in sorted(
-                group_by_type(self.doc)[EntityDirective.Declaration],
-                key=constrained,
-                reverse=True
-            )
+            (Entity.declared(i), i)
+            for i in group_by_type(self.doc)[EntityDirective.Declaration]
         ])
-        for e in entities.values():
-            types = tuple(filter(
-                None,
-                (e.string_import(t, relative)
-                 for t in e["options"].get("types", []))
-            ))
-            states = tuple(filter(
-                None,
-                (int(t) if t.isdigit() else e.string_import(t, relative)
-                 for t in e["options"].get("states", []))
-            ))
-            otherRoles = {i.lower() for i in e["options"].get("roles", [])}
-            typ = types or object
-            persona = next(
-                (i for i in pool
-                 if isinstance(i, typ) and
-                 getattr(i, "get_state", not states) and
-                 all(str(i.get_state(type(s))).startswith(str(s)) for s in states) and
-                 (performing[i].issubset(otherRoles) or not otherRoles)),
-                None
-            )
-            rv[e] = persona
-            performing[persona].update(set(e.attributes["names"]))
-
-            if not otherRoles or list(rv.values()).count(persona) == roles:
-                try:
-                    pool.remove(persona)
-                except ValueError:
-                    self.log.debug(
-                        "No persona for type {0} and states {1} with {2} {3}.".format(
-                            typ, states, roles, "role" if roles == 1 else "roles"
-                        ),
-                        {"path": self.fP}
-                    )
-        return rv
+        selection = CompiledScript.choose(
+            entities, personae, relative=relative, roles=roles, path=self.fP, optimal=optimal
+        )
+        return OrderedDict([(entities[e], p) for e, p in selection.items()])
 
     def cast(self, mapping):
         """Allocate the scene script a cast of personae for each of its entities.
 
-        :param mapping: A dictionary of {Entity, Persona}
+        :param mapping: A dictionary of {Entity, Persona}. The keys may be
+            entity declarations from the document or
+            :py:class:`~turberfield.dialogue.compiled.Entity` objects.
         :return: The SceneScript object.
 
+        The document itself is left unchanged, so that it may be shared by
+        many SceneScript objects, each with a cast of its own.
+
         """
-        # See 'citation' method in
-        # http://docutils.sourceforge.net/docutils/parsers/rst/states.py
+        self.personae = {}
         for c, p in mapping.items():
-            self.doc.note_citation(c)
-            self.doc.note_explicit_target(c, c)
-            c.persona = p
-            self.log.debug(
-                "{0} to be played by {1}".format(c["names"][0].capitalize(), p),
-                {"path": self.fP}
-            )
+            names = c.names if isinstance(c, Entity) else c["names"]
+            self.personae.update({name: p for name in names})
+            if Model.routed(self.log, self.log.Level.DEBUG):
+                self.log.debug(
+                    "{0} to be played by {1}".format(names[0].capitalize(), p),
+                    {"path": self.fP}
+                )
         return self
 
-    def run(self):
+    def run(self, stream=False, markup=True):
         """Parse the script file.
 
+        :param bool stream: If `True`, the document is walked only as the
+            model is iterated, so that each item is available as soon as it
+            is complete. A streaming model may be iterated once only.
+        :param bool markup: Pass `False` to generate plain text only.
         :rtype: :py:class:`~turberfield.dialogue.model.Model`
         """
+        model = Model(self.fP, self.doc, self.personae, markup=markup)
+        if stream:
+            model.streaming = True
+        else:
+            self.doc.walkabout(model)
+        return model
+
+    def compile(self):
+        """Compile the script so it can be performed without docutils.
+
+        The result does not depend on any cast, and may be pickled and
+        shared between processes.
+
+        :rtype: :py:class:`~turberfield.dialogue.compiled.CompiledScript`
+        """
         model = Model(self.fP, self.doc)
         self.doc.walkabout(model)
-        return model
+        return CompiledScript(
+            self.fP,
+            [Entity.declared(i) for i in group_by_type(self.doc)[EntityDirective.Declaration]],
+            model.shots, model.fields, model.lookups
+        )
 
-Assembly.register(Model.Audio, Model.Line, Model.Memory, Model.Property, Model.Still, Model.Video)
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# encoding: UTF-8
+
+# This file is part of turberfield.
+#
+# Turberfield is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Turberfield is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with turberfield.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import importlib.util
+import os.path
+import sys
+
+from turberfield.utils.logger import LogManager
+
+
+class Pathfinder:
+    """Locate Python objects from their names as written in a scene script.
+
+    Successful lookups are memoized in :py:attr:`Pathfinder.cache`. Call
+    :py:meth:`Pathfinder.invalidate` if the objects behind those names
+    are replaced, eg: when modules are reloaded.
+
+    """
+
+    #: A dictionary of {(arg, relative, sep): object}.
+    cache = {}
+
+    #: The number of lookups satisfied from the cache.
+    hits = 0
+
+    #: The number of lookups which had to be resolved.
+    misses = 0
+
+    @staticmethod
+    def invalidate(arg=None, relative=False, sep=None):
+        """Discard memoized lookups.
+
+        :param str arg: The name to forget. If omitted, the entire cache
+            is cleared and the counters reset.
+        :return: The number of entries discarded.
+
+        """
+        if arg is None:
+            rv = len(Pathfinder.cache)
+            Pathfinder.cache.clear()
+            Pathfinder.hits = Pathfinder.misses = 0
+            return rv
+        else:
+            return int(Pathfinder.cache.pop((arg.strip(), relative, sep), None) is not None)
+
+    @staticmethod
+    def string_import(arg, relative=False, sep=None, path=None, line_nr=None):
+        arg = arg.strip()
+        key = (arg, relative, sep)
+        try:
+            rv = Pathfinder.cache[key]
+        except KeyError:
+            Pathfinder.misses += 1
+        else:
+            Pathfinder.hits += 1
+            return rv
+
+        rv = Pathfinder.resolve(arg, relative, sep, path, line_nr)
+        if rv is not None:
+            Pathfinder.cache[key] = rv
+        return rv
+
+    @staticmethod
+    def resolve(arg, relative=False, sep=None, path=None, line_nr=None):
+        log = LogManager().get_logger(
+            "turberfield.dialogue.model"
+        ).clone("turberfield.dialogue.directives")
+        if not arg:
+            log.warning(
+                "Empty argument",
+                {"path": path, "line_nr": line_nr},
+            )
+            return None
+
+        try:
+            return int(arg)
+        except ValueError:
+            pass
+
+        bits = arg.split(".")
+        if sep is None:
+            index = min(n for n, i in enumerate(bits) if i and i[0].isupper())
+        elif sep != ".":
+            index = min(n for n, i in enumerate(bits) if i and sep in i) + 1
+            bits = arg.replace(sep, ".").split(".")
+        else:
+            index = -1
+
+        start = 1 if relative else 0
+        modName = ".".join(bits[start:index])
+        try:
+            # Try importing an installed module
+            mod = importlib.import_module(modName)
+        except ImportError:
+            # Try importing a source file at this location
+            mN = bits[index - 1]
+            fP = os.path.abspath(modName.replace(".", os.sep)) + ".py"
+            mod = sys.modules.get(mN)
+            if getattr(mod, "__file__", None) != fP:
+                # Not yet loaded from this file
+                spec = importlib.util.spec_from_file_location(mN, fP)
+                if spec is None:
+                    return None
+                mod = importlib.util.module_from_spec(spec)
+                spec.loader.exec_module(mod)
+                sys.modules[mN] = mod
+
+        obj = mod
+        for name in bits[index:]:
+            try:
+                obj = getattr(obj, name)
+            except AttributeError:
+                log.warning(
+                    "Object missing an attribute",
+                    {"path": path, "line_nr": line_nr},
+                    token=name
+                )
+                return None
+
+        return obj
+
+    @staticmethod
+    def string_split(arg):
+        return arg.split()
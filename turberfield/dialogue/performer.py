@@ -16,29 +16,58 @@
 # You should have received a copy of the GNU General Public License
 # along with turberfield.  If not, see <http://www.gnu.org/licenses/>.
 
+import asyncio
 from collections import defaultdict
+from collections import OrderedDict
+import enum
 import itertools
 import re
 
+from turberfield.dialogue.compiled import CompiledScript
+from turberfield.dialogue.compiled import Predicate
 from turberfield.dialogue.model import Model
 from turberfield.dialogue.model import SceneScript
+from turberfield.dialogue.types import DataObject
+from turberfield.dialogue.types import Ensemble
 from turberfield.dialogue.types import Stateful
 
 
 class Performer:
 
+    #: Types whose values cannot change once created.
+    immutable = (bool, bytes, enum.Enum, float, frozenset, int, str, tuple, type(None))
+
+    #: The number of condition results each performer keeps.
+    #: See :py:meth:`~turberfield.dialogue.performer.Performer.evaluate`.
+    limit = 1024
+
     @staticmethod
-    def next(folders, ensemble, strict=True, roles=1):
+    def next(folders, ensemble, strict=True, roles=1, optimal=False):
+        """Find the next scene script which can be cast from the ensemble.
+
+        Casting is checked against the
+        :py:meth:`~turberfield.dialogue.model.SceneScript.manifest` of each
+        script, so script files are not parsed again on every call.
+
+        Pass `optimal=True` to cast each script with
+        :py:meth:`~turberfield.dialogue.compiled.CompiledScript.match`.
+
+        :return: A tuple of (folder, index, script, selection, interlude)
+            or `None` if no script can be cast.
+
+        """
         for folder in folders:
             scripts = SceneScript.scripts(**folder._asdict())
             interludes = folder.interludes or itertools.repeat(None)
             for index, script, interlude in zip(itertools.count(), scripts, interludes):
-                with script as dialogue:
-                    selection = dialogue.select(ensemble, roles=roles)
-                    if selection and all(selection.values()):
-                        return (folder, index, script, selection, interlude)
-                    elif not strict and any(selection.values()):
-                        return (folder, index, script, selection, interlude)
+                selection = CompiledScript.choose(
+                    SceneScript.manifest(script.fP), ensemble,
+                    roles=roles, path=script.fP, optimal=optimal
+                )
+                if selection and all(selection.values()):
+                    return (folder, index, script, selection, interlude)
+                elif not strict and any(selection.values()):
+                    return (folder, index, script, selection, interlude)
         else:
             return None
 
@@ -56,25 +85,96 @@ class Performer:
 
     @staticmethod
     def allows(item: Model.Condition):
-        if item.format == "state" and isinstance(item.object, Stateful):
-            rhs = item.value
-            if item.regex:
-                lhs = item.object.state
-            else:
-                lhs = item.object.get_state(type(item.value))
+        """Evaluate a condition.
+
+        The test is prepared when the script is read. See
+        :py:class:`~turberfield.dialogue.compiled.Predicate`.
+
+        :param item: A :py:class:`~turberfield.dialogue.model.Model.Condition` object.
+        :return: A true value if the condition holds.
+
+        """
+        if item.predicate is None:
+            return Predicate.compile(item.format, item.regex)(item.object, item.value)
         else:
-            fmt = "".join(("{0.", item.format, "}"))
+            return item.predicate.test(item.object, item.value)
+
+    @staticmethod
+    def stable(obj, format_):
+        """Find whether a condition depends only on changes which are counted.
+
+        The attribute named first in the path must be tracked by
+        :py:meth:`~turberfield.dialogue.types.Stateful.version`. It and every
+        value reached from it must be of an immutable type.
+
+        :param obj: The object of a condition.
+        :param str format_: The format of the condition.
+        :rtype: bool
+
+        """
+        if not format_ or any(i in format_ for i in "[]{}!:"):
+            return False
+
+        names = format_.split(".")
+        if not (
+            (isinstance(obj, DataObject) and names[0] in vars(obj)) or
+            (isinstance(obj, Stateful) and names[0] == "state")
+        ):
+            return False
+
+        for name in names:
             try:
-                lhs = fmt.format(item.object)
-            except (AttributeError, IndexError, KeyError, ValueError):
+                obj = getattr(obj, name)
+            except AttributeError:
+                return True
+            if not isinstance(obj, Performer.immutable):
                 return False
-            else:
-                rhs = str(item.value)
+        return True
 
-        if item.regex:
-            return item.regex.match(str(lhs))
-        else:
-            return lhs == rhs
+    def evaluate(self, item: Model.Condition):
+        """Evaluate a condition, reusing an earlier result if nothing it depends on has changed.
+
+        Results are remembered, so that folders performed repeatedly do not
+        evaluate the same conditions again. The object of each condition is
+        watched from then on; see :py:meth:`~turberfield.dialogue.types.Stateful.watch`.
+        When more than :py:attr:`~turberfield.dialogue.performer.Performer.limit`
+        results are kept, the least recently used is discarded.
+
+        :param item: A :py:class:`~turberfield.dialogue.model.Model.Condition` object.
+        :return: The result of :py:meth:`~turberfield.dialogue.performer.Performer.allows`.
+
+        """
+        if item.predicate is None or not isinstance(item.object, (DataObject, Stateful)):
+            return self.allows(item)
+
+        key = (item.predicate, item.object, item.value)
+        version = Stateful.watch(item.object)
+        try:
+            cached = self.evaluations.get(key)
+        except TypeError:
+            # Unhashable value
+            return self.allows(item)
+
+        if cached is not None and cached[0] == version:
+            self.evaluations.move_to_end(key)
+            stable, rv = cached[1:]
+            return rv if stable else self.allows(item)
+
+        rv = self.allows(item)
+        self.evaluations[key] = (version, self.stable(item.object, item.format), rv)
+        self.evaluations.move_to_end(key)
+        while len(self.evaluations) > self.limit:
+            self.evaluations.popitem(last=False)
+        return rv
+
+    @property
+    def shot_index(self):
+        """An OrderedDict of {(scene, shot): offset} for the script most recently run.
+
+        See :py:attr:`~turberfield.dialogue.model.Model.shot_index`.
+
+        """
+        return self.model.shot_index if self.model is not None else OrderedDict()
 
     @property
     def stopped(self):
@@ -86,19 +186,27 @@ class Performer:
 
         :param folders: A sequence of
             :py:class:`~turberfield.dialogue.model.SceneScript.Folder` objects.
-        :param ensemble: A sequence of Python objects.
+        :param ensemble: A sequence of Python objects. It is indexed
+            as an :py:class:`~turberfield.dialogue.types.Ensemble` for casting,
+            which follows later changes to a list.
+            Pass an Ensemble to share one index between performers.
 
         """
 
         self.folders = folders
-        self.ensemble = ensemble
+        self.ensemble = ensemble if isinstance(ensemble, Ensemble) else Ensemble(ensemble)
         self.metadata = defaultdict(list)
         self.shots = []
         self.script = None
+        self.model = None
         self.selection = None
         self.condition = None
+        self.evaluations = OrderedDict()
 
-    def run(self, react=True, strict=True, roles=1):
+    def run(
+        self, react=True, strict=True, roles=1, optimal=False, stream=False, markup=True,
+        start_at=None
+    ):
         """Select a cast and perform the next scene.
 
         :param bool react: If `True`, then Property directives are executed
@@ -106,12 +214,20 @@ class Performer:
             so they can be enacted later on.
         :param bool strict: Only fully-cast scripts to be performed.
         :param int roles: Maximum number of roles permitted each character.
+        :param bool optimal: Cast by matching rather than by first fit.
+        :param bool stream: Generate events while the script is still being
+            read. See :py:meth:`~turberfield.dialogue.model.SceneScript.run`.
+        :param bool markup: Pass `False` to generate events without HTML.
+        :param start_at: An optional (scene, shot) pair of names. The
+            performance begins at that shot, so a session may resume where
+            it stopped. See :py:meth:`~turberfield.dialogue.model.Model.seek`.
 
         This method is a generator. It yields events from the performance.
 
         If a :py:class:`~turberfield.dialogue.model.Model.Condition` is
         encountered, it is evaluated. No events are generated while the most recent
-        condition is False.
+        condition is False. The items so excluded are skipped over, up to the
+        next condition or shot; they are neither bound to the cast nor enacted.
 
         A new :py:class:`~turberfield.dialogue.model.Model.Shot` resets the
         current condition.
@@ -120,12 +236,16 @@ class Performer:
         try:
             folder, index, self.script, self.selection, interlude = self.next(
                 self.folders, self.ensemble,
-                strict=strict, roles=roles
+                strict=strict, roles=roles, optimal=optimal
             )
         except TypeError:
             raise GeneratorExit
         with self.script as dialogue:
-            model = dialogue.cast(self.selection).run()
+            model = dialogue.cast(self.selection).run(stream=stream, markup=markup)
+            self.model = model
+            if start_at is not None:
+                model.seek(*start_at)
+
             for shot, item in model:
 
                 if self.condition is not False:
@@ -137,7 +257,10 @@ class Performer:
                     self.condition = None
 
                 if isinstance(item, Model.Condition):
-                    self.condition = self.allows(item)
+                    self.condition = self.evaluate(item)
+                    if self.condition is False:
+                        # Nothing more is generated until the next condition or shot
+                        model.skip()
 
                 if react:
                     self.react(item)
@@ -145,3 +268,25 @@ class Performer:
             for key, value in model.metadata:
                 if value not in self.metadata[key]:
                     self.metadata[key].append(value)
+
+    async def arun(self, **kwargs):
+        """Select a cast and perform the next scene within an event loop.
+
+        This method takes the same keyword arguments as
+        :py:meth:`~turberfield.dialogue.performer.Performer.run`.
+        It is an asynchronous generator. It yields the same events, but
+        returns control to the loop at the start of every shot, so that many
+        performances may share a single thread.
+
+        Nothing is generated if none of the folders can be cast.
+
+        """
+        shot = None
+        try:
+            for item in self.run(**kwargs):
+                if isinstance(item, Model.Shot) and item != shot:
+                    shot = item
+                    await asyncio.sleep(0)
+                yield item
+        except GeneratorExit:
+            return
@@ -16,11 +16,14 @@
 # You should have received a copy of the GNU General Public License
 # along with turberfield.  If not, see <http://www.gnu.org/licenses/>.
 
+import asyncio
 from collections.abc import Callable
+import inspect
 
 from turberfield.dialogue.matcher import Matcher
 from turberfield.dialogue.model import SceneScript
 from turberfield.dialogue.performer import Performer
+from turberfield.dialogue.types import Ensemble
 from turberfield.utils.logger import LogManager
 
 
@@ -62,6 +65,8 @@ def rehearse(
     :param bool strict: Only fully-cast scripts to be performed.
 
     This function is a generator. It yields events from the performance.
+    Interludes may not be coroutine functions; perform those with
+    :py:func:`~turberfield.dialogue.player.arehearse`.
 
     """
     if isinstance(folders, SceneScript.Folder):
@@ -70,17 +75,23 @@ def rehearse(
     yield from handler(references, loop=loop)
 
     matcher = Matcher(folders)
-    performer = Performer(folders, references)
+    pool = Ensemble(references)
+    performer = Performer(folders, pool)
     while True:
         folder, index, script, selection, interlude = performer.next(
-            folders, references, strict=strict, roles=roles
+            folders, pool, strict=strict, roles=roles
         )
         yield from handler(script, loop=loop)
 
         for item in performer.run(react=False, strict=strict, roles=roles):
             yield from handler(item, loop=loop)
 
-        if isinstance(interlude, Callable):
+        if asyncio.iscoroutinefunction(interlude):
+            raise TypeError(
+                "Interlude {0!r} is a coroutine function. "
+                "Use arehearse to await it.".format(interlude)
+            )
+        elif isinstance(interlude, Callable):
             metadata = next(handler(
                 interlude, folder, index, references, loop=loop
             ), None)
@@ -90,7 +101,94 @@ def rehearse(
 
             branch = next(matcher.options(metadata))
             if branch != folder:
-                performer = Performer([branch], references)
+                performer = Performer([branch], pool)
+
+        if not repeat:
+            break
+        else:
+            repeat -= 1
+
+
+async def delivery(rv):
+    """Adapt the output of a handler to an asynchronous performance.
+
+    :param rv: The value returned by a handler. It may be an asynchronous
+        generator, a coroutine, or an iterable. Any awaitable it produces
+        is awaited in turn.
+
+    This function is an asynchronous generator. It yields the results of the handler.
+
+    """
+    if hasattr(rv, "__aiter__"):
+        async for item in rv:
+            yield (await item) if inspect.isawaitable(item) else item
+    elif inspect.isawaitable(rv):
+        item = await rv
+        yield (await item) if inspect.isawaitable(item) else item
+    else:
+        for item in rv:
+            yield (await item) if inspect.isawaitable(item) else item
+
+
+async def arehearse(
+    folders, references, handler,
+    repeat=0, roles=1, strict=False,
+    loop=None
+):
+    """Cast a set of objects into a sequence of scene scripts. Deliver the performance
+    within an event loop.
+
+    This is the asynchronous counterpart of
+    :py:func:`~turberfield.dialogue.player.rehearse`, and takes the same arguments.
+    The handler may be a generator function, an asynchronous generator function,
+    or a coroutine function. Interludes may be coroutine functions.
+
+    The handler is passed the running loop unless another is given.
+    Handlers should not block. The shipped handlers pause in their clock, which
+    blocks the loop; pass the
+    :py:meth:`~turberfield.dialogue.handlers.TerminalHandler.play` method of one
+    as the handler, so that its pauses are awaited instead.
+
+    This function is an asynchronous generator. It yields events from the performance.
+
+    """
+    loop = loop or asyncio.get_running_loop()
+    if isinstance(folders, SceneScript.Folder):
+        folders = [folders]
+
+    async for rv in delivery(handler(references, loop=loop)):
+        yield rv
+
+    matcher = Matcher(folders)
+    pool = Ensemble(references)
+    performer = Performer(folders, pool)
+    while True:
+        folder, index, script, selection, interlude = performer.next(
+            folders, pool, strict=strict, roles=roles
+        )
+        async for rv in delivery(handler(script, loop=loop)):
+            yield rv
+
+        async for item in performer.arun(react=False, strict=strict, roles=roles):
+            async for rv in delivery(handler(item, loop=loop)):
+                yield rv
+
+        if isinstance(interlude, Callable):
+            results = delivery(handler(
+                interlude, folder, index, references, loop=loop
+            ))
+            metadata = None
+            async for metadata in results:
+                break
+            await results.aclose()
+
+            yield metadata
+            if metadata is None:
+                return
+
+            branch = next(matcher.options(metadata))
+            if branch != folder:
+                performer = Performer([branch], pool)
 
         if not repeat:
             break
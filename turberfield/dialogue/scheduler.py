@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# encoding: UTF-8
+
+# This file is part of turberfield.
+#
+# Turberfield is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Turberfield is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with turberfield.  If not, see <http://www.gnu.org/licenses/>.
+
+import heapq
+import itertools
+import threading
+
+from turberfield.dialogue.clock import Clock
+
+
+class Scheduler:
+    """Deliver paced output to many sessions from a single loop.
+
+    Each session is identified by its output stream. Text put to a session
+    is queued with the time it falls due. Pauses in that session put back
+    the time at which its next text is due. The queue is a heap, so the
+    cost of each operation grows only with the logarithm of the number
+    of events waiting.
+
+    A session is forgotten once its last text is written and its last
+    pause is over.
+
+    Nothing blocks the producer of a session. Call
+    :py:meth:`~turberfield.dialogue.scheduler.Scheduler.run` or
+    :py:meth:`~turberfield.dialogue.scheduler.Scheduler.serve`
+    to release text as it falls due.
+
+    :param clock: An optional :py:class:`~turberfield.dialogue.clock.Clock` object.
+
+    """
+
+    def __init__(self, clock=None):
+        self.clock = clock or Clock()
+        self.queue = []
+        self.sessions = {}
+        self.expiry = []
+        self.counter = itertools.count()
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.queue)
+
+    def put(self, stream, text):
+        """Queue text for delivery to a session.
+
+        :param stream: The output stream of the session.
+        :param str text: The text to write.
+        :return: The time at which the text will be written.
+
+        """
+        with self.lock:
+            now = self.clock.time()
+            self.expire(now)
+            due = max(now, self.sessions.get(stream, now))
+            heapq.heappush(self.queue, (due, next(self.counter), stream, text))
+            self.renew(stream, due)
+            return due
+
+    def pause(self, stream, interval):
+        """Delay the next delivery to a session.
+
+        :param stream: The output stream of the session.
+        :param float interval: The time in seconds to pause.
+        :return: The time at which the session may next be written.
+
+        """
+        with self.lock:
+            now = self.clock.time()
+            self.expire(now)
+            due = max(now, self.sessions.get(stream, now)) + max(0, interval)
+            self.renew(stream, due)
+            return due
+
+    def renew(self, stream, due):
+        self.sessions[stream] = due
+        heapq.heappush(self.expiry, (due, next(self.counter), stream))
+
+    def expire(self, now):
+        """Forget the sessions which have nothing queued and are not paused.
+
+        :param float now: The current time.
+
+        """
+        while self.expiry and self.expiry[0][0] <= now:
+            due, n, stream = heapq.heappop(self.expiry)
+            if self.sessions.get(stream) == due:
+                # Not renewed since
+                del self.sessions[stream]
+
+    def due(self):
+        """Report when the next text is to be written.
+
+        :return: A time, or `None` if nothing is queued.
+
+        """
+        with self.lock:
+            return self.queue[0][0] if self.queue else None
+
+    def release(self):
+        """Write all text which is now due.
+
+        :return: The number of items written.
+
+        """
+        now = self.clock.time()
+        ready = []
+        with self.lock:
+            while self.queue and self.queue[0][0] <= now:
+                ready.append(heapq.heappop(self.queue))
+            self.expire(now)
+
+        streams = []
+        for due, n, stream, text in ready:
+            stream.write(text)
+            if stream not in streams:
+                streams.append(stream)
+
+        for stream in streams:
+            stream.flush()
+        return len(ready)
+
+    def run(self):
+        """Release queued text on time until the queue is empty.
+
+        :return: The number of items written.
+
+        """
+        rv = 0
+        due = self.due()
+        while due is not None:
+            interval = due - self.clock.time()
+            if interval > 0:
+                self.clock.sleep(interval)
+            rv += self.release()
+            due = self.due()
+        return rv
+
+    async def serve(self):
+        """Release queued text on time until the queue is empty,
+        without blocking the event loop.
+
+        :return: The number of items written.
+
+        """
+        rv = 0
+        due = self.due()
+        while due is not None:
+            await self.clock.wait(max(0, due - self.clock.time()))
+            rv += self.release()
+            due = self.due()
+        return rv
@@ -87,15 +87,16 @@ class CastingTests(unittest.TestCase):
         )
         self.script = next(SceneScript.scripts(**folder._asdict()))
 
-    def test_casting_adds_citation_definition(self):
+    def test_casting_leaves_document_unchanged(self):
         with self.script as script:
             self.assertFalse(script.doc.citations)
             self.assertEqual(3, len(script.doc.citation_refs))
             casting = script.select(self.personae)
             self.assertIsInstance(casting, collections.abc.Mapping, casting)
             script.cast(casting)
-            self.assertEqual(3, len(script.doc.citations))
+            self.assertFalse(script.doc.citations)
             self.assertEqual(3, len(script.doc.citation_refs))
+            self.assertEqual(3, len(script.personae))
 
     def test_casting_respects_type(self):
         for n in range(16):
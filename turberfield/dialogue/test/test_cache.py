@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# encoding: UTF-8
+
+# This file is part of turberfield.
+#
+# Turberfield is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Turberfield is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with turberfield.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import tempfile
+import textwrap
+import unittest
+from unittest import mock
+
+import docutils.parsers.rst
+
+from turberfield.dialogue.cache import DocumentCache
+from turberfield.dialogue.model import Model
+from turberfield.dialogue.model import SceneScript
+from turberfield.dialogue.types import Player
+
+
+class DocumentCacheTests(unittest.TestCase):
+
+    content = textwrap.dedent("""
+        .. entity:: P
+
+        Scene
+        ~~~~~
+
+        Shot
+        ----
+
+        [P]_
+
+            Hi, I'm |P_FIRSTNAME|.
+
+        .. |P_FIRSTNAME| property:: P.name.firstname
+        """)
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.cache = DocumentCache(self.dir.name)
+        SceneScript.cache = self.cache
+
+    def tearDown(self):
+        SceneScript.cache = None
+        self.dir.cleanup()
+
+    def test_key_depends_on_text(self):
+        self.assertEqual(self.cache.key(self.content), self.cache.key(self.content))
+        self.assertNotEqual(self.cache.key(self.content), self.cache.key(self.content + "\n"))
+
+    def test_key_depends_on_directives(self):
+        key = self.cache.key(self.content)
+        with mock.patch.dict(docutils.parsers.rst.directives._directives, {"extra": Model}):
+            self.assertEqual(key, self.cache.key(self.content))
+            self.assertNotEqual(key, DocumentCache(self.dir.name).key(self.content))
+        self.assertEqual(key, DocumentCache(self.dir.name).key(self.content))
+
+    def test_key_depends_on_docutils_version(self):
+        key = self.cache.key(self.content)
+        with mock.patch.object(docutils, "__version__", "0.0.0"):
+            self.assertNotEqual(key, DocumentCache(self.dir.name).key(self.content))
+
+    def test_signature_computed_once(self):
+        with mock.patch.object(DocumentCache, "signature", return_value="") as signature:
+            cache = DocumentCache(self.dir.name)
+            cache.key(self.content)
+            cache.key(self.content + "\n")
+            self.assertEqual(1, signature.call_count)
+
+    def test_key_depends_on_includes(self):
+        with tempfile.TemporaryDirectory() as parent:
+            fP = os.path.join(parent, "script.rst")
+            inner = os.path.join(parent, "inner.rst")
+            outer = os.path.join(parent, "outer.rst")
+            with open(inner, "w") as output:
+                output.write("Hello.\n")
+            with open(outer, "w") as output:
+                output.write(".. include:: inner.rst\n")
+
+            content = self.content + "\n.. include:: outer.rst\n"
+            self.assertEqual([outer], self.cache.includes(content, fP))
+            self.assertEqual([inner], self.cache.includes(".. include:: {0}".format(inner)))
+
+            key = self.cache.key(content, fP)
+            self.assertIn("Hello.", SceneScript.read(content, fP).astext())
+            with open(inner, "w") as output:
+                output.write("Goodbye.\n")
+            self.assertNotEqual(key, self.cache.key(content, fP))
+            self.assertIn("Goodbye.", SceneScript.read(content, fP).astext())
+
+    def test_read_stores_document(self):
+        doc = SceneScript.read(self.content)
+        key = self.cache.key(self.content)
+        self.assertTrue(os.path.isfile(self.cache.location(key)))
+        rv = self.cache.get(key, SceneScript.settings)
+        self.assertEqual(doc.astext(), rv.astext())
+        self.assertIs(SceneScript.settings, rv.settings)
+
+    def test_read_skips_parser(self):
+        SceneScript.read(self.content)
+        with mock.patch.object(docutils.parsers.rst.Parser, "parse") as parse:
+            doc = SceneScript.read(self.content)
+            self.assertFalse(parse.called)
+
+        script = SceneScript("inline", doc=doc)
+        p = Player(name="Mr William Fuzzer Testfixture")
+        model = script.cast(script.select([p])).run()
+        shot, line = next(iter(model))
+        self.assertEqual("shot", shot.name)
+        self.assertIs(p, line.persona)
+        self.assertEqual("Hi, I'm William.", line.text)
+
+    def test_corrupt_entry(self):
+        SceneScript.read(self.content)
+        key = self.cache.key(self.content)
+        with open(self.cache.location(key), "wb") as corrupt:
+            corrupt.write(b"\x00")
+
+        self.assertIsNone(self.cache.get(key, SceneScript.settings))
+        doc = SceneScript.read(self.content)
+        self.assertIsNotNone(self.cache.get(key, SceneScript.settings))
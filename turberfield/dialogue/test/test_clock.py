@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# encoding: UTF-8
+
+# This file is part of turberfield.
+#
+# Turberfield is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Turberfield is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with turberfield.  If not, see <http://www.gnu.org/licenses/>.
+
+import asyncio
+import copy
+import io
+import time
+import types
+import unittest
+
+from turberfield.dialogue.clock import Clock
+from turberfield.dialogue.clock import VirtualClock
+from turberfield.dialogue.handlers import CGIHandler
+from turberfield.dialogue.handlers import TerminalHandler
+from turberfield.dialogue.model import Model
+from turberfield.dialogue.player import rehearse
+from turberfield.dialogue.sequences.battle.logic import ensemble, folder
+
+
+class ClockTests(unittest.TestCase):
+
+    def test_virtual_sleep(self):
+        clock = VirtualClock(start=10)
+        clock.sleep(1.5, "a")
+        clock.sleep(-1, "b")
+        clock.sleep(0.5)
+        self.assertEqual(12, clock.time())
+        self.assertEqual(
+            [(10, 1.5, "a"), (11.5, 0, "b"), (11.5, 0.5, None)],
+            clock.timeline
+        )
+
+    def test_virtual_wait(self):
+        clock = VirtualClock()
+
+        async def main():
+            await asyncio.gather(clock.wait(2, "a"), clock.wait(3, "b"))
+
+        asyncio.run(main())
+        self.assertEqual(5, clock.time())
+        self.assertEqual(["a", "b"], [i.obj for i in clock.timeline])
+
+    def test_wall_clock(self):
+        clock = Clock()
+        then = clock.time()
+        clock.sleep(0.01)
+        self.assertGreaterEqual(clock.time() - then, 0.01)
+
+
+class HandlerClockTests(unittest.TestCase):
+
+    def setUp(self):
+        self.terminal = types.SimpleNamespace(normal="", dim="", stream=io.StringIO())
+        self.folder = copy.deepcopy(folder)
+
+    def test_default_clock(self):
+        handler = TerminalHandler(self.terminal)
+        self.assertIsInstance(handler.clock, Clock)
+        self.assertNotIsInstance(handler.clock, VirtualClock)
+
+    def test_terminal_handler(self):
+        clock = VirtualClock()
+        handler = TerminalHandler(self.terminal, pause=1.2, dwell=0.3, clock=clock)
+        then = time.monotonic()
+        rv = list(rehearse(self.folder, ensemble(), handler))
+        self.assertLess(time.monotonic() - then, 1.2)
+
+        lines = [i for i in rv if isinstance(i, Model.Line) and i.persona is not None]
+        self.assertTrue(lines)
+        self.assertIsInstance(clock.timeline[0].obj, Model.Shot)
+        self.assertEqual(lines, [i.obj for i in clock.timeline[1:]])
+        self.assertAlmostEqual(
+            1.2 * (len(lines) + 1) + 0.3 * sum(i.text.count(" ") for i in lines),
+            clock.time()
+        )
+
+    def test_cgi_handler(self):
+        clock = VirtualClock()
+        handler = CGIHandler(self.terminal, pause=1.2, dwell=0.3, clock=clock)
+        list(rehearse(self.folder, ensemble(), handler))
+        self.assertTrue(clock.timeline)
+        self.assertIn("event: line", self.terminal.stream.getvalue())
+        self.assertEqual(sum(i.interval for i in clock.timeline), clock.time())
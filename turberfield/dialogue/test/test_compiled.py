@@ -0,0 +1,360 @@
+#!/usr/bin/env python3
+# encoding: UTF-8
+
+# This file is part of turberfield.
+#
+# Turberfield is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Turberfield is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with turberfield.  If not, see <http://www.gnu.org/licenses/>.
+
+import pickle
+import re
+import subprocess
+import sys
+import textwrap
+import unittest
+
+from turberfield.dialogue.compiled import CompiledScript
+from turberfield.dialogue.compiled import Entity
+from turberfield.dialogue.compiled import Predicate
+from turberfield.dialogue.model import Model
+from turberfield.dialogue.model import SceneScript
+from turberfield.dialogue.types import Player
+
+
+class CompiledScriptTests(unittest.TestCase):
+
+    content = textwrap.dedent("""
+        .. entity:: P
+           :types: turberfield.dialogue.types.Player
+
+        .. entity:: Q
+
+        :author: |P_SURNAME|
+
+        Scene
+        ~~~~~
+
+        Shot
+        ----
+
+        [P]_
+
+            Hi, I'm |P_FIRSTNAME| & you're |Q_FIRSTNAME|.
+
+        .. property:: Q.name P.name
+
+        .. fx:: turberfield.dialogue.sequences |P_FIRSTNAME|.mp3
+           :offset: 0
+           :duration: 3000
+           :loop: 1
+
+        .. |P_FIRSTNAME| property:: P.name.firstname
+        .. |P_SURNAME| property:: P.name.surname
+        .. |Q_FIRSTNAME| property:: Q.name.firstname
+        """)
+
+    def setUp(self):
+        self.personae = [
+            Player(name="Mr William Fuzzer Testfixture"),
+            Player(name="Ms Laura Anne Sample"),
+        ]
+
+    def test_compile(self):
+        script = SceneScript("inline", doc=SceneScript.read(self.content))
+        compiled = script.compile()
+        self.assertIsInstance(compiled, CompiledScript)
+        self.assertEqual(2, len(compiled.entities))
+        self.assertIn(
+            Entity(("p",), ("turberfield.dialogue.types.Player",), (), ()),
+            compiled.entities
+        )
+
+    def test_output_matches_model(self):
+        script = SceneScript("inline", doc=SceneScript.read(self.content))
+        compiled = script.compile()
+        expected = list(script.cast(script.select(self.personae)).run())
+
+        cast = compiled.cast(compiled.select(self.personae))
+        self.assertEqual([i for s, i in expected], [i for s, i in cast])
+        self.assertEqual([("author", "Testfixture")], cast.metadata)
+
+        shot, line = expected[0]
+        self.assertIsInstance(line, Model.Line)
+        self.assertEqual("Hi, I'm William & you're Laura.", line.text)
+        self.assertIn("&amp;", line.html)
+        self.assertIs(self.personae[0], line.persona)
+
+        shot, prop = expected[1]
+        self.assertIs(self.personae[1], prop.object)
+        self.assertEqual("name", prop.attr)
+        self.assertIs(self.personae[0].name, prop.val)
+
+        shot, cue = expected[2]
+        self.assertEqual("William.mp3", cue.resource)
+
+    def test_compile_once_cast_many(self):
+        script = SceneScript("inline", doc=SceneScript.read(self.content))
+        compiled = script.compile()
+
+        first = list(compiled.cast(compiled.select(self.personae)))
+        second = list(compiled.cast(compiled.select(reversed(self.personae))))
+        self.assertEqual("Hi, I'm William & you're Laura.", first[0][1].text)
+        self.assertEqual("Hi, I'm Laura & you're William.", second[0][1].text)
+
+    def test_pickle(self):
+        script = SceneScript("inline", doc=SceneScript.read(self.content))
+        compiled = pickle.loads(pickle.dumps(script.compile()))
+        cast = compiled.cast(compiled.select(self.personae))
+        shot, line = next(iter(cast))
+        self.assertEqual("Hi, I'm William & you're Laura.", line.text)
+
+    def test_seek(self):
+        script = SceneScript("inline", doc=SceneScript.read(self.content))
+        compiled = script.compile()
+        self.assertEqual(list(script.run().shot_index.items()), list(compiled.shot_index.items()))
+
+        scene, shot = next(iter(compiled.shot_index))
+        cast = compiled.cast(compiled.select(self.personae))
+        self.assertIs(cast, cast.seek(scene, shot))
+        self.assertEqual(len(list(compiled.cast(compiled.select(self.personae)))), len(list(cast)))
+        self.assertRaises(KeyError, cast.seek, scene, "missing")
+
+    def test_no_docutils(self):
+        code = textwrap.dedent("""
+            import sys
+            import turberfield.dialogue.compiled
+            import turberfield.dialogue.events
+            print("docutils" in sys.modules)
+        """)
+        rv = subprocess.run(
+            [sys.executable, "-c", code], stdout=subprocess.PIPE, check=True,
+            universal_newlines=True
+        )
+        self.assertEqual("False", rv.stdout.strip())
+
+
+class MatchTests(unittest.TestCase):
+
+    def setUp(self):
+        self.personae = [
+            Player(name="Mr William Fuzzer Testfixture").set_state(1),
+            Player(name="Ms Laura Anne Sample"),
+        ]
+
+    def test_greedy_can_fail(self):
+        entities = [
+            Entity(("a",), ("turberfield.dialogue.types.Player",), (), ()),
+            Entity(("b",), (), ("1",), ()),
+        ]
+        rv = CompiledScript.choose(entities, self.personae)
+        self.assertIsNone(rv[entities[1]])
+
+        rv = CompiledScript.choose(entities, self.personae, optimal=True)
+        self.assertEqual(entities, list(rv.keys()))
+        self.assertIs(self.personae[1], rv[entities[0]])
+        self.assertIs(self.personae[0], rv[entities[1]])
+
+    def test_roles(self):
+        entities = [
+            Entity(("a",), (), ("1",), ("b",)),
+            Entity(("b",), (), ("1",), ()),
+            Entity(("c",), (), (), ()),
+        ]
+        rv = CompiledScript.choose(entities, self.personae, optimal=True)
+        self.assertEqual([self.personae[0], None, self.personae[1]], list(rv.values()))
+
+        rv = CompiledScript.choose(entities, self.personae, roles=2, optimal=True)
+        self.assertEqual(
+            [self.personae[0], self.personae[0], self.personae[1]], list(rv.values())
+        )
+
+    def test_large_pool(self):
+        personae = [Player(name="Player {0}".format(i)) for i in range(20000)]
+        for n, p in enumerate(personae[-10:]):
+            p.set_state(n + 100)
+        entities = [Entity((str(i),), (), (str(i + 100),), ()) for i in range(10)]
+        entities.append(Entity(("any",), (), (), ()))
+        rv = CompiledScript.choose(entities, personae, optimal=True)
+        self.assertTrue(all(rv.values()))
+        self.assertEqual(11, len(set(rv.values())))
+
+
+class PredicateTests(unittest.TestCase):
+
+    class Thing:
+        count = 3
+        name = "Bob"
+        flag = True
+        ratio = 0.5
+
+    def test_attributes(self):
+        thing = PredicateTests.Thing()
+        for format_, value, expected in [
+            ("count", 3, True), ("count", "3", True), ("count", 4, False),
+            ("name", "Bob", True), ("name", "Ann", False),
+            ("flag", True, True), ("flag", "True", True), ("ratio", 0.5, True),
+            ("name[0]", "B", True), ("name.upper", "Bob", False),
+            ("missing", 3, False), ("", 3, False), ("name[9]", "B", False),
+        ]:
+            with self.subTest(format_=format_, value=value):
+                fmt = "".join(("{0.", format_, "}"))
+                self.assertEqual(expected, Predicate(format_)(thing, value))
+                try:
+                    self.assertEqual(fmt.format(thing) == str(value), expected)
+                except (AttributeError, IndexError, ValueError):
+                    self.assertFalse(expected)
+
+    def test_regex(self):
+        thing = PredicateTests.Thing()
+        predicate = Predicate("count", re.compile("([13579])"))
+        self.assertTrue(predicate(thing, None))
+        thing.count = 2
+        self.assertFalse(predicate(thing, None))
+
+    def test_state(self):
+        p = Player(name="Mr William Fuzzer Testfixture").set_state(3)
+        self.assertTrue(Predicate("state")(p, 3))
+        self.assertFalse(Predicate("state")(p, 2))
+        self.assertTrue(Predicate("state", re.compile("([0-4])"))(p, None))
+        self.assertIs(False, Predicate("state")(PredicateTests.Thing(), None))
+
+    def test_pickle(self):
+        predicate = Predicate("count", re.compile("([13579])"))
+        rv = pickle.loads(pickle.dumps(predicate))
+        self.assertEqual(predicate, rv)
+        self.assertEqual(hash(predicate), hash(rv))
+        self.assertTrue(rv(PredicateTests.Thing(), None))
+
+
+class SubstitutionTests(unittest.TestCase):
+
+    class Counted(Player):
+
+        count = 0
+
+        @property
+        def title(self):
+            self.count += 1
+            return self.name.title
+
+    content = textwrap.dedent("""
+        .. entity:: P
+
+        Scene
+        ~~~~~
+
+        Shot
+        ----
+
+        [P]_
+
+            I'm |P_TITLE| |P_SURNAME|. Call me |P_TITLE|.
+
+        .. fx:: turberfield.dialogue.sequences |P_TITLE|.png
+           :offset: 0
+           :duration: 0
+           :loop: 1
+
+        [P]_
+
+            Still |P_TITLE| |P_SURNAME|.
+
+        .. |P_TITLE| property:: P.title
+        .. |P_SURNAME| property:: P.name.surname
+        """)
+
+    def test_substitutions_compiled_once(self):
+        script = SceneScript("inline", doc=SceneScript.read(self.content))
+        model = script.cast(script.select([])).run()
+        self.assertEqual({"P_TITLE"}, set(model.getters))
+        self.assertEqual({"P_TITLE", "P_SURNAME"}, set(model.fragments))
+        self.assertEqual([("p", "title"), ("p", "name.surname")], list(model.lookups))
+
+    def test_evaluated_once_per_cast(self):
+        p = SubstitutionTests.Counted(name="Ms Laura Anne Sample")
+        script = SceneScript("inline", doc=SceneScript.read(self.content))
+        compiled = script.compile()
+
+        items = [i for s, i in compiled.cast(compiled.select([p]))]
+        self.assertEqual(1, p.count)
+        self.assertEqual("I'm Ms Sample. Call me Ms.", items[0].text)
+        self.assertEqual("Ms.png", items[1].resource)
+        self.assertEqual("Still Ms Sample.", items[2].text)
+
+        list(compiled.cast(compiled.select([p])))
+        self.assertEqual(2, p.count)
+
+    def test_resolved_when_cast(self):
+        content = textwrap.dedent("""
+            .. entity:: P
+
+            Scene
+            ~~~~~
+
+            Shot
+            ----
+
+            .. property:: P.state 3
+
+            [P]_
+
+                Now I am |P_STATE|.
+
+            .. |P_STATE| property:: P.state
+            """)
+        compiled = SceneScript("inline", doc=SceneScript.read(content)).compile()
+        p = Player(name="Ms Anna Conda").set_state(1)
+        script = SceneScript("inline", doc=SceneScript.read(content))
+        expected = [i for s, i in script.cast(script.select([p])).run()]
+
+        lines = []
+        for shot, item in compiled.cast(compiled.select([p])):
+            if isinstance(item, Model.Property):
+                setattr(item.object, item.attr, item.val)
+            elif isinstance(item, Model.Line):
+                lines.append(item.text)
+        self.assertEqual(3, p.state)
+        self.assertEqual(["Now I am 1."], lines)
+        self.assertEqual(lines, [i.text for i in expected if isinstance(i, Model.Line)])
+
+    def test_empty_line_dropped(self):
+        content = textwrap.dedent("""
+            .. entity:: P
+
+            Scene
+            ~~~~~
+
+            Shot
+            ----
+
+            [P]_
+
+                |P_MISSING|
+
+            [P]_
+
+                Hello.
+
+            .. |P_MISSING| property:: P.missing
+            """)
+        p = Player(name="Ms Anna Conda")
+        compiled = SceneScript("inline", doc=SceneScript.read(content)).compile()
+        script = SceneScript("inline", doc=SceneScript.read(content))
+        script.cast(script.select([p]))
+        for mode, items in (
+            ("compiled", [i for s, i in compiled.cast(compiled.select([p]))]),
+            ("walk", [i for s, i in script.run()]),
+            ("stream", [i for s, i in script.run(stream=True)]),
+        ):
+            with self.subTest(mode=mode):
+                self.assertEqual(["Hello."], [i.text for i in items])
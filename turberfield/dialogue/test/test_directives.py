@@ -17,12 +17,17 @@
 # along with turberfield.  If not, see <http://www.gnu.org/licenses/>.
 
 
+from collections import OrderedDict
+import os
 import sys
+import tempfile
 import textwrap
 import unittest
+from unittest import mock
 
 from turberfield.dialogue.directives import Entity
 from turberfield.dialogue.model import SceneScript
+from turberfield.dialogue.pathfinder import Pathfinder
 
 from turberfield.utils.misc import group_by_type
 
@@ -215,3 +220,59 @@ class EntityDeclarationTests(unittest.TestCase):
                     self.assertFalse(obj["content"])
                 elif n == 2:
                     self.assertTrue(obj["content"])
+
+
+class PathfinderTests(unittest.TestCase):
+
+    def setUp(self):
+        Pathfinder.invalidate()
+
+    def tearDown(self):
+        Pathfinder.invalidate()
+
+    def test_cache_hits(self):
+        arg = "collections.OrderedDict"
+        self.assertIs(OrderedDict, Pathfinder.string_import(arg))
+        self.assertEqual((0, 1), (Pathfinder.hits, Pathfinder.misses))
+        with mock.patch.object(Pathfinder, "resolve") as resolve:
+            self.assertIs(OrderedDict, Pathfinder.string_import(arg))
+            self.assertFalse(resolve.called)
+        self.assertEqual((1, 1), (Pathfinder.hits, Pathfinder.misses))
+
+        self.assertIs(OrderedDict, Pathfinder.string_import(arg, sep="."))
+        self.assertEqual((1, 2), (Pathfinder.hits, Pathfinder.misses))
+
+    def test_failure_not_cached(self):
+        arg = "turberfield.dialogue.test.test_directives.PathfinderTests.Missing"
+        self.assertIsNone(Pathfinder.string_import(arg))
+        self.assertIsNone(Pathfinder.string_import(arg))
+        self.assertEqual((0, 2), (Pathfinder.hits, Pathfinder.misses))
+        self.assertFalse(Pathfinder.cache)
+
+    def test_invalidate(self):
+        arg = "turberfield.dialogue.test.test_directives.PathfinderTests"
+        Pathfinder.string_import(arg)
+        self.assertEqual(0, Pathfinder.invalidate(arg, sep="."))
+        self.assertEqual(1, Pathfinder.invalidate(arg))
+        self.assertFalse(Pathfinder.cache)
+        Pathfinder.string_import(arg)
+        self.assertEqual((0, 2), (Pathfinder.hits, Pathfinder.misses))
+
+    def test_file_module_loaded_once(self):
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as parent:
+            with open(os.path.join(parent, "tbf_fixture.py"), "w") as module:
+                module.write("class Thing:\n    pass\n")
+
+            try:
+                os.chdir(parent)
+                with mock.patch(
+                    "turberfield.dialogue.pathfinder.importlib.import_module",
+                    side_effect=ImportError
+                ):
+                    rv = Pathfinder.string_import("tbf_fixture.Thing")
+                    Pathfinder.invalidate()
+                    self.assertIs(rv, Pathfinder.string_import("tbf_fixture.Thing"))
+            finally:
+                os.chdir(cwd)
+                sys.modules.pop("tbf_fixture", None)
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# encoding: UTF-8
+
+# This file is part of turberfield.
+#
+# Turberfield is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Turberfield is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with turberfield.  If not, see <http://www.gnu.org/licenses/>.
+
+from collections import namedtuple
+import copy
+import pickle
+import tracemalloc
+import unittest
+
+from turberfield.dialogue.events import Condition
+from turberfield.dialogue.events import Event
+from turberfield.dialogue.events import Line
+from turberfield.dialogue.events import Property
+from turberfield.dialogue.events import Shot
+from turberfield.dialogue.events import Still
+from turberfield.utils.assembly import Assembly
+
+
+class EventTests(unittest.TestCase):
+
+    def test_fields(self):
+        line = Line("p", "Hello.", None, "a.rst", 7)
+        self.assertIsInstance(line, Event)
+        self.assertEqual(("persona", "text", "html", "path", "line_nr"), Line._fields)
+        self.assertEqual("Hello.", line.text)
+        self.assertEqual(("p", "Hello."), line[:2])
+        self.assertEqual(5, len(line))
+        self.assertEqual(("p", "Hello.", None, "a.rst", 7), tuple(line))
+        self.assertEqual(line, Line(persona="p", text="Hello.", html=None, path="a.rst", line_nr=7))
+        self.assertEqual(hash(line), hash(tuple(line)))
+        self.assertEqual(Line("p", "Hello.", None), line._replace(path=None, line_nr=None))
+        self.assertEqual(
+            ("package", "resource", "offset", "duration", "loop", "label", "width", "height"),
+            Still._fields[:-2]
+        )
+
+    def test_condition_positions(self):
+        condition = Condition(None, "state", None, 1, "a.rst", 7)
+        self.assertEqual("a.rst", condition.path)
+        self.assertEqual(7, condition.line_nr)
+        self.assertIsNone(condition.predicate)
+
+    def test_immutable(self):
+        line = Line("p", "Hello.", None)
+        self.assertRaises(AttributeError, setattr, line, "text", "Goodbye.")
+        self.assertRaises(ValueError, line._replace, speech="Goodbye.")
+        self.assertRaises(TypeError, Line, "p")
+
+    def test_path_interned(self):
+        a = Line("p", "Hello.", None, "".join(["a", ".rst"]))
+        b = Shot("shot", "scene", [], "".join(["a", ".", "rst"]))
+        self.assertIs(a.path, b.path)
+
+    def test_pickle(self):
+        line = Line("p", "Hello.", None, "a.rst", 7)
+        self.assertEqual(line, pickle.loads(pickle.dumps(line)))
+        self.assertEqual(line, copy.deepcopy(line))
+
+    def test_assembly(self):
+        line = Line("p", "Hello.", "<p>Hello.</p>", "a.rst", 7)
+        text = Assembly.dumps(line)
+        self.assertIn('"_type": "turberfield.dialogue.model.Line"', text)
+        rv = Assembly.loads(text)
+        self.assertIsInstance(rv, Line)
+        self.assertEqual(line, rv)
+
+    def test_assembly_baseline(self):
+        # Serialized when events were namedtuples defined in the model
+        line = Assembly.loads(
+            '{"_type": "turberfield.dialogue.model.Line", "persona": null, '
+            '"text": "Hello.", "html": "<p>Hello.</p>", "path": "a.rst", "line_nr": 7}'
+        )
+        self.assertIsInstance(line, Line)
+        self.assertEqual(Line(None, "Hello.", "<p>Hello.</p>", "a.rst", 7), line)
+
+        prop = Assembly.loads(
+            '{"_type": "turberfield.dialogue.model.Property", "entity": null, '
+            '"object": null, "attr": "state", "val": 1, "path": "a.rst", "line_nr": 9}'
+        )
+        self.assertIsInstance(prop, Property)
+        self.assertEqual(Property(None, None, "state", 1, "a.rst", 9), prop)
+
+        rv = Assembly.loads(
+            '{"_type": "turberfield.dialogue.events.Line",'
+            ' "persona": null, "text": "Hi.", "html": null}'
+        )
+        self.assertEqual(Line(None, "Hi.", None), rv)
+
+    def test_memory(self):
+        Tuple = namedtuple("Tuple", Line._fields, defaults=(None, None))
+        texts = ["Line number {0}.".format(n) for n in range(100000)]
+
+        def footprint(factory):
+            tracemalloc.start()
+            try:
+                corpus = [factory("p", text, None, "a.rst", n) for n, text in enumerate(texts)]
+                return tracemalloc.get_traced_memory()[0]
+            finally:
+                tracemalloc.stop()
+
+        self.assertLess(footprint(Line), footprint(Tuple))
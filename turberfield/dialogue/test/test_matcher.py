@@ -23,8 +23,11 @@ import enum
 import numbers
 import operator
 import unittest
+from unittest import mock
 
+from turberfield.dialogue.matcher import FeatureMatcher
 from turberfield.dialogue.matcher import Matcher
+from turberfield.dialogue.matcher import numpy
 from turberfield.dialogue.model import SceneScript
 
 
@@ -140,3 +143,167 @@ class MatcherTests(unittest.TestCase):
         rv = list(matcher.options({"pos": 0}))
         self.assertEqual(1, len(rv), rv)
         self.assertEqual({"pos": 0.5}, rv[0].metadata)
+
+    def test_beyond_last(self):
+        matcher = Matcher(self.folders)
+        rv = list(matcher.options({"pos": 4}))
+        self.assertEqual(1, len(rv), rv)
+        self.assertEqual({"pos": 3}, rv[0].metadata)
+
+    def test_empty(self):
+        matcher = Matcher()
+        self.assertEqual([], list(matcher.options({"pos": 4})))
+
+    def test_exact_match_by_index(self):
+        matcher = Matcher(self.folders)
+        self.assertEqual(4, len(matcher.index))
+        with mock.patch.object(Matcher, "mapping_key", wraps=Matcher.mapping_key) as mapping_key:
+            rv = list(matcher.options({"pos": 2}))
+            self.assertEqual(1, mapping_key.call_count)
+        self.assertEqual([self.folders[3]], rv)
+
+    def test_unhashable_metadata(self):
+        folders = [
+            SceneScript.Folder(
+                "turberfield.dialogue.test", "Folder {0}".format(n), {"tags": [n]},
+                ["{0}.rst".format(n)], None)
+            for n in range(3)
+        ]
+        matcher = Matcher(folders)
+        self.assertFalse(matcher.index)
+        rv = list(matcher.options({"tags": [1]}))
+        self.assertEqual([folders[1]], rv)
+
+    def test_add(self):
+        matcher = Matcher(self.folders[:2])
+        for folder in self.folders[2:]:
+            matcher.add(folder)
+        expected = Matcher(self.folders)
+        self.assertEqual(expected.keys, matcher.keys)
+        self.assertEqual(expected.folders, matcher.folders)
+        self.assertEqual(expected.index, matcher.index)
+        self.assertEqual([self.folders[3]], list(matcher.options({"pos": 2})))
+
+    def test_add_duplicate(self):
+        matcher = Matcher(self.folders)
+        folder = self.folders[0]._replace(paths=["other.rst"])
+        self.assertEqual(2, matcher.add(folder))
+        self.assertIs(self.folders[0], matcher.folders[1])
+        self.assertEqual([self.folders[0]], list(matcher.options({"pos": 1})))
+
+    def test_remove(self):
+        matcher = Matcher(self.folders)
+        self.assertEqual(1, matcher.remove(self.folders[0]))
+        self.assertEqual(3, len(matcher.keys))
+        self.assertNotIn(((("pos",), "1"),), matcher.index)
+        rv = list(matcher.options({"pos": 1}))
+        self.assertEqual([{"pos": 0.5}, {"pos": 2}], [i.metadata for i in rv])
+        self.assertRaises(ValueError, matcher.remove, self.folders[0])
+
+    def test_remove_duplicate(self):
+        folder = self.folders[0]._replace(paths=["other.rst"])
+        matcher = Matcher(self.folders + [folder])
+        matcher.remove(self.folders[0])
+        self.assertEqual([folder], list(matcher.options({"pos": 1})))
+
+    def test_remove_unhashable(self):
+        folders = [
+            SceneScript.Folder(
+                "turberfield.dialogue.test", "Folder {0}".format(n), {"tags": [n]},
+                ["{0}.rst".format(n)], None)
+            for n in range(3)
+        ]
+        matcher = Matcher(folders)
+        matcher.remove(folders[1])
+        self.assertEqual([folders[0], folders[2]], matcher.folders)
+
+    def test_replace(self):
+        matcher = Matcher(self.folders)
+        folder = self.folders[2]._replace(metadata={"pos": 0})
+        self.assertEqual(0, matcher.replace(self.folders[2], folder))
+        self.assertEqual([folder], list(matcher.options({"pos": 0})))
+        self.assertEqual([{"pos": 2}], [i.metadata for i in matcher.options({"pos": 3})])
+
+
+class FeatureMatcherTests(unittest.TestCase):
+
+    def setUp(self):
+        self.folders = [
+            SceneScript.Folder(
+                "turberfield.dialogue.test", "Folder {0}".format(n), metadata,
+                ["{0}.rst".format(n)], None)
+            for n, metadata in enumerate([
+                {"pos": 1, "scale": Scale.one},
+                {"pos": 1, "scale": Scale.two},
+                {"pos": 3, "scale": Scale.one, "surface": {"finish": Surface.b}},
+                {"pos": 3, "scale": Scale.two, "mood": "sad"},
+            ])
+        ]
+
+    def test_features(self):
+        self.assertEqual(
+            {("pos",): 3.0, ("scale",): 2.0, ("surface", "finish"): 5.0, ("mood", "sad"): 1.0},
+            FeatureMatcher.features(
+                {"pos": 3, "scale": Scale.two, "surface": {"finish": Surface.b}, "mood": "sad"}
+            )
+        )
+
+    @unittest.skipUnless(numpy, "NumPy not installed")
+    def test_exact_match(self):
+        matcher = FeatureMatcher(self.folders)
+        self.assertEqual(4, len(matcher.dimensions))
+        rv = list(matcher.options({"pos": 3, "scale": Scale.two, "mood": "sad"}))
+        self.assertEqual([self.folders[3]], rv)
+
+    @unittest.skipUnless(numpy, "NumPy not installed")
+    def test_nearest_in_two_dimensions(self):
+        matcher = FeatureMatcher(self.folders)
+        rv = list(matcher.options({"pos": 1.2, "scale": Scale.two}))
+        self.assertEqual(2, len(rv))
+        self.assertEqual(self.folders[1], rv[0])
+        self.assertEqual(self.folders[0], rv[1])
+
+    @unittest.skipUnless(numpy, "NumPy not installed")
+    def test_nearest_batch(self):
+        matcher = FeatureMatcher(self.folders)
+        rv = matcher.nearest([
+            {"pos": 0, "scale": Scale.one},
+            {"pos": 2.9, "scale": Scale.two, "mood": "sad"},
+            {"pos": 3, "scale": Scale.one, "surface": {"finish": Surface.a}},
+            {"pos": 1, "scale": Scale.two},
+        ])
+        self.assertEqual([self.folders[i] for i in (0, 3, 2, 1)], rv)
+
+    def test_nearest_empty(self):
+        self.assertEqual([None], FeatureMatcher().nearest([{"pos": 1}]))
+
+    def test_without_numpy(self):
+        with mock.patch("turberfield.dialogue.matcher.numpy", None):
+            matcher = FeatureMatcher(self.folders)
+            self.assertIsNone(matcher.matrix)
+            self.assertEqual(
+                list(Matcher(self.folders).options({"pos": 2})),
+                list(matcher.options({"pos": 2}))
+            )
+            self.assertEqual(
+                [self.folders[3]],
+                matcher.nearest([{"pos": 3, "scale": Scale.two, "mood": "sad"}])
+            )
+
+    @unittest.skipUnless(numpy, "NumPy not installed")
+    def test_add_and_remove(self):
+        matcher = FeatureMatcher(self.folders[:2])
+        for folder in self.folders[2:]:
+            matcher.add(folder)
+        expected = FeatureMatcher(self.folders)
+        self.assertEqual(expected.folders, matcher.folders)
+        self.assertEqual(set(expected.dimensions), set(matcher.dimensions))
+        queries = [i.metadata for i in self.folders] + [{"pos": 2, "mood": "sad"}]
+        self.assertTrue(numpy.allclose(expected.distances(queries), matcher.distances(queries)))
+
+        matcher.remove(self.folders[3])
+        self.assertEqual((3, 4), matcher.matrix.shape)
+        self.assertEqual(
+            [self.folders[1]],
+            matcher.nearest([{"pos": 2.9, "scale": Scale.two, "mood": "sad"}])
+        )
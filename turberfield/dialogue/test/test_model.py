@@ -23,13 +23,17 @@ import operator
 import sys
 import textwrap
 import unittest
+from unittest import mock
 import uuid
 
+from turberfield.dialogue.compiled import CompiledScript
+from turberfield.dialogue.compiled import escape
 from turberfield.dialogue.directives import Entity
 from turberfield.dialogue.model import Model
 from turberfield.dialogue.model import SceneScript
 from turberfield.dialogue.performer import Performer
 from turberfield.dialogue.types import DataObject
+from turberfield.dialogue.types import Ensemble
 from turberfield.dialogue.types import EnumFactory
 from turberfield.dialogue.types import Stateful
 from turberfield.dialogue.types import Player
@@ -601,6 +605,10 @@ class ConditionDirectiveTests(unittest.TestCase):
         self.assertFalse(Performer.allows(conditions[2]))
         self.assertTrue(Performer.allows(conditions[3]))
 
+        self.assertTrue(all(i.predicate for i in conditions))
+        self.assertTrue(Performer.allows(conditions[0]._replace(predicate=None)))
+        self.assertFalse(Performer.allows(conditions[1]._replace(predicate=None)))
+
     def test_condition_evaluation_two(self):
         effects = [
             ConditionDirectiveTests.Rain().set_state(ConditionDirectiveTests.Weather.quiet),
@@ -1021,6 +1029,29 @@ class SelectTests(unittest.TestCase):
         self.assertEqual(ensemble[0], rv[1])
         self.assertEqual(ensemble[1], rv[0])
 
+    def test_select_from_ensemble(self):
+
+        content = textwrap.dedent("""
+            .. entity:: FIGHTER_1
+               :states: turberfield.dialogue.test.test_model.SelectTests.Aggression.angry
+
+            .. entity:: FIGHTER_2
+               :states: turberfield.dialogue.test.test_model.SelectTests.Location.pub
+            """)
+        ensemble = Ensemble(copy.deepcopy(PropertyDirectiveTests.personae))
+        people = list(ensemble)
+        people[0].set_state(SelectTests.Location.pub_snug)
+        people[1].set_state(SelectTests.Aggression.angry)
+        script = SceneScript("inline", doc=SceneScript.read(content))
+        rv = list(script.select(ensemble).values())
+        self.assertEqual([people[1], people[0]], rv)
+        self.assertEqual(4, len(ensemble))
+
+        people[1].set_state(SelectTests.Aggression.calm)
+        people[2].set_state(SelectTests.Aggression.angry)
+        rv = list(script.select(ensemble).values())
+        self.assertEqual([people[2], people[0]], rv)
+
     def test_select_with_hierarchical_state(self):
 
         content = textwrap.dedent("""
@@ -1140,6 +1171,37 @@ class SelectTests(unittest.TestCase):
         self.assertEqual(ensemble[0], rv[0])
         self.assertEqual(ensemble[0], rv[1])
 
+    def test_get_entity(self):
+        content = "\n".join(".. entity:: E_{0:03}\n".format(i) for i in range(200))
+        script = SceneScript("inline", doc=SceneScript.read(content))
+        model = script.cast(script.select([])).run()
+        self.assertEqual(200, len(model.index))
+        self.assertEqual(["e_199"], model.get_entity("E_199")["names"])
+        self.assertIsNone(model.get_entity("E_200"))
+        self.assertIsNone(model.get_entity(None))
+
+    def test_shared_document(self):
+        content = textwrap.dedent("""
+            .. entity:: P
+
+            [P]_
+
+                My name is |P_FIRSTNAME|.
+
+            .. |P_FIRSTNAME| property:: P.name.firstname
+            """)
+        doc = SceneScript.read(content)
+        one = SceneScript("inline", doc=doc)
+        two = SceneScript("inline", doc=doc)
+        one.cast(one.select(PropertyDirectiveTests.personae[0:1]))
+        two.cast(two.select(PropertyDirectiveTests.personae[1:2]))
+        self.assertFalse(doc.citations)
+
+        lines = zip(one.run(), two.run())
+        (_, a), (_, b) = next(lines)
+        self.assertEqual("My name is William.", a.text)
+        self.assertEqual("My name is Anna.", b.text)
+
 
 class HTMLEscapingTests(unittest.TestCase):
 
@@ -1216,6 +1278,28 @@ class HTMLEscapingTests(unittest.TestCase):
         line = model.shots[0].items[0]
         self.assertEqual(5, line.html.count("&"), line.html)
 
+    def test_escape_fast_path(self):
+        text = "Nothing to escape here."
+        self.assertIs(text, escape(text))
+        self.assertEqual("M&amp;B", escape("M&B"))
+
+    def test_escape_table_shared(self):
+        content = textwrap.dedent("""
+            Characters
+            ==========
+
+            Ampersand
+            ---------
+
+            Three pints of M&B please.
+
+        """)
+        script = SceneScript("inline", doc=SceneScript.read(content))
+        with mock.patch("html.entities.html5", {}):
+            model = script.run()
+        line = model.shots[0].items[0]
+        self.assertIn("M&amp;B", line.html)
+
 
 class RstFeatureTests(unittest.TestCase):
 
@@ -1330,3 +1414,365 @@ class RstFeatureTests(unittest.TestCase):
         model = script.run()
         self.assertEqual(2, model.shots[-1].items[-1].html.count("marquee"))
         self.assertEqual(0, model.shots[-1].items[-1].text.count("marquee"))
+
+
+class StreamTests(unittest.TestCase):
+
+    def test_stream_matches_walk(self):
+        for path in ("battle/combat.rst", "cloak/bar.rst", "cloak/foyer.rst"):
+            with self.subTest(path=path):
+                script = next(SceneScript.scripts(
+                    "turberfield.dialogue.sequences", None, [path]
+                ))
+                with script as dialogue:
+                    dialogue.cast(dialogue.select(PropertyDirectiveTests.personae))
+                    expected = [i for s, i in dialogue.run()]
+                    model = dialogue.run(stream=True)
+                    self.assertEqual(expected, [i for s, i in model])
+                    self.assertFalse(any(i.items for i in model.shots))
+
+    def test_stream_reads_values_at_start(self):
+        content = textwrap.dedent("""
+            .. entity:: P
+
+            Scene
+            ~~~~~
+
+            Shot
+            ----
+
+            .. property:: P.state 3
+
+            [P]_
+
+                Now I am |P_STATE|.
+
+            .. |P_STATE| property:: P.state
+            """)
+        for stream in (False, True):
+            with self.subTest(stream=stream):
+                p = Player(name="Ms Anna Conda").set_state(1)
+                script = SceneScript("inline", doc=SceneScript.read(content))
+                script.cast(script.select([p]))
+                lines = []
+                for shot, item in script.run(stream=stream):
+                    if isinstance(item, Model.Property):
+                        setattr(item.object, item.attr, item.val)
+                    elif isinstance(item, Model.Line):
+                        lines.append(item.text)
+                self.assertEqual(3, p.state)
+                self.assertEqual(["Now I am 1."], lines)
+
+    def test_stream_reads_setter_values_at_start(self):
+        content = textwrap.dedent("""
+            .. entity:: P
+
+            .. entity:: Q
+
+            Scene
+            ~~~~~
+
+            Shot
+            ----
+
+            .. property:: P.state 3
+
+            .. property:: Q.state P.state
+            """)
+        results = []
+        for stream in (False, True):
+            p = Player(name="Ms Anna Conda").set_state(1)
+            q = Player(name="Mr Q").set_state(0)
+            script = SceneScript("inline", doc=SceneScript.read(content))
+            script.cast(script.select([p, q]))
+            for shot, item in script.run(stream=stream):
+                if isinstance(item, Model.Property):
+                    setattr(item.object, item.attr, item.val)
+            results.append((p.state, q.state))
+        self.assertEqual([(3, 1), (3, 1)], results)
+
+    def test_document_unchanged_by_run(self):
+        content = textwrap.dedent("""
+            .. entity:: P
+
+            Scene
+            ~~~~~
+
+            Shot
+            ----
+
+            [P]_
+
+                Now I am |P_STATE|.
+
+            .. |P_STATE| property:: P.state
+            """)
+        doc = SceneScript.read(content)
+        defs = dict(doc.substitution_defs)
+        for stream in (False, True):
+            with self.subTest(stream=stream):
+                p = Player(name="Ms Anna Conda").set_state(1)
+                script = SceneScript("inline", doc=doc)
+                script.cast(script.select([p]))
+                lines = [
+                    i.text for s, i in script.run(stream=stream)
+                    if isinstance(i, Model.Line)
+                ]
+                self.assertEqual(["Now I am 1."], lines)
+                self.assertEqual(defs, doc.substitution_defs)
+
+    def test_stream_is_lazy(self):
+        content = textwrap.dedent("""
+            Scene
+            =====
+
+            One
+            ---
+
+            First.
+
+            Second.
+
+            Two
+            ---
+
+            Third.
+            """)
+        script = SceneScript("inline", doc=SceneScript.read(content))
+        model = script.run(stream=True)
+        items = iter(model)
+        shot, line = next(items)
+        self.assertEqual("one", shot.name)
+        self.assertEqual("First.", line.text)
+        self.assertEqual(["one"], [i.name for i in model.shots])
+
+        self.assertEqual(["Second.", "Third."], [i.text for s, i in items])
+        self.assertEqual(["one", "two"], [i.name for i in model.shots])
+
+    def test_stream_raw_html(self):
+        content = textwrap.dedent("""
+            Scene
+            =====
+
+            Shot
+            ----
+
+            I know what it needs...
+
+            .. raw:: html
+
+                <marquee>Puppies die when you do bad design</marquee>
+        """)
+        script = SceneScript("inline", doc=SceneScript.read(content))
+        shot, line = list(script.run(stream=True))[-1]
+        self.assertEqual(2, line.html.count("marquee"))
+        self.assertEqual(0, line.text.count("marquee"))
+
+
+class MarkupTests(unittest.TestCase):
+
+    def test_text_only(self):
+        for path in ("battle/combat.rst", "cloak/bar.rst", "cloak/foyer.rst"):
+            with self.subTest(path=path):
+                script = next(SceneScript.scripts(
+                    "turberfield.dialogue.sequences", None, [path]
+                ))
+                with script as dialogue:
+                    dialogue.cast(dialogue.select(PropertyDirectiveTests.personae))
+                    expected = [i for s, i in dialogue.run()]
+                    items = [i for s, i in dialogue.run(markup=False)]
+                    self.assertEqual(len(expected), len(items))
+                    for a, b in zip(expected, items):
+                        if isinstance(a, (Model.Line, Model.Memory)):
+                            self.assertEqual(a.text, b.text)
+                            self.assertIsNone(b.html)
+                        else:
+                            self.assertEqual(a, b)
+
+    def test_text_only_footnote(self):
+        content = textwrap.dedent("""
+            Scene
+            =====
+
+            Shot
+            ----
+
+            I said [#]_.
+
+            .. [#] A footnote.
+            """)
+        script = SceneScript("inline", doc=SceneScript.read(content))
+        items = [i for s, i in script.run(markup=False)]
+        self.assertTrue(items)
+        self.assertTrue(all(i.html is None for i in items))
+
+
+class LoggingTests(unittest.TestCase):
+
+    content = textwrap.dedent("""
+        Scene
+        =====
+
+        Shot
+        ----
+
+        I said [#]_.
+
+        .. [#] A footnote.
+        """)
+
+    def test_logger_shared(self):
+        a = SceneScript("inline", doc=SceneScript.read(self.content))
+        b = SceneScript("inline", doc=SceneScript.read(self.content))
+        self.assertIs(a.log, b.log)
+        self.assertIs(CompiledScript.logger(), a.log)
+        self.assertEqual("turberfield.dialogue.model.scenescript", a.log.name)
+        self.assertIs(a.run().log, b.run().log)
+
+    def test_debug_skipped_when_not_routed(self):
+        script = SceneScript("inline", doc=SceneScript.read(self.content))
+        script.run()
+        with mock.patch.object(Model, "routed", return_value=False), \
+                mock.patch.object(Model.log, "debug") as debug:
+            model = script.run()
+            self.assertFalse(model.debugging)
+            self.assertTrue(list(model))
+            self.assertFalse(debug.called)
+
+    def test_debug_when_routed(self):
+        script = SceneScript("inline", doc=SceneScript.read(self.content))
+        script.run()
+        with mock.patch.object(Model, "routed", return_value=True), \
+                mock.patch.object(Model.log, "debug") as debug:
+            model = script.run()
+            self.assertTrue(model.debugging)
+            self.assertTrue(list(model))
+            self.assertTrue(debug.called)
+
+    def test_routed(self):
+        script = SceneScript("inline", doc=SceneScript.read(self.content))
+        log = script.run().log
+        self.assertTrue(Model.routed(log, log.Level.CRITICAL))
+        self.assertFalse(Model.routed(log, log.Level.NOTSET))
+
+    def test_routes_follow_main(self):
+        script = SceneScript("inline", doc=SceneScript.read(self.content))
+        self.assertFalse(script.run().debugging)
+        main = script.log_manager.get_logger("main")
+        routes = [
+            route for pair, group in script.log_manager.pairings
+            if pair.logger_name == main.name
+            for route in group
+        ]
+        try:
+            script.log_manager.set_route(
+                main, main.Level.DEBUG, routes[0].adapter, routes[0].endpoint
+            )
+            self.assertTrue(script.run().debugging)
+            log = CompiledScript.logger()
+            self.assertTrue(Model.routed(log, log.Level.DEBUG))
+        finally:
+            for route in routes:
+                script.log_manager.set_route(main, route.level, route.adapter, route.endpoint)
+        self.assertFalse(script.run().debugging)
+        self.assertFalse(Model.routed(CompiledScript.logger(), log.Level.DEBUG))
+
+
+class SeekTests(unittest.TestCase):
+
+    content = textwrap.dedent("""
+        Scene 1
+        =======
+
+        Shot 1
+        ------
+
+        One.
+
+        Shot 2
+        ------
+
+        Two.
+
+        Scene 2
+        =======
+
+        Shot 3
+        ------
+
+        Three.
+
+        Four.
+        """)
+
+    def setUp(self):
+        self.script = SceneScript("inline", doc=SceneScript.read(self.content))
+
+    def test_shot_index(self):
+        model = self.script.run()
+        self.assertEqual(
+            [("scene 1", "shot 1"), ("scene 1", "shot 2"), ("scene 2", "shot 3")],
+            list(model.shot_index)
+        )
+        self.assertEqual([0, 1, 2], list(model.shot_index.values()))
+
+    def test_seek(self):
+        model = self.script.run().seek("scene 1", "shot 2")
+        self.assertEqual(["Two.", "Three.", "Four."], [i.text for s, i in model])
+
+    def test_seek_streaming(self):
+        model = self.script.run(stream=True).seek("scene 2", "shot 3")
+        with mock.patch.object(model.cast, "bind", wraps=model.cast.bind) as bind:
+            self.assertEqual(["Three.", "Four."], [i.text for s, i in model])
+            self.assertEqual(2, bind.call_count)
+
+    def test_seek_missing(self):
+        self.assertRaises(KeyError, self.script.run().seek, "scene 3", "shot 1")
+        model = self.script.run(stream=True).seek("scene 3", "shot 1")
+        with self.assertRaises(KeyError):
+            list(model)
+
+
+class SkipTests(unittest.TestCase):
+
+    content = textwrap.dedent("""
+        .. entity:: P
+
+        Scene
+        =====
+
+        First
+        -----
+
+        One.
+
+        Two.
+
+        .. condition:: P.state 1
+
+        Three.
+
+        Second
+        ------
+
+        Four.
+        """)
+
+    def setUp(self):
+        self.script = SceneScript("inline", doc=SceneScript.read(self.content))
+
+    def test_condition_index(self):
+        self.assertEqual(((2,), ()), self.script.run().condition_index)
+
+    def test_skip(self):
+        for stream in (False, True):
+            with self.subTest(stream=stream):
+                model = self.script.run(stream=stream)
+                rv = []
+                for shot, item in model:
+                    rv.append(item)
+                    if getattr(item, "text", None) in ("One.", "Three."):
+                        model.skip()
+
+                self.assertIsInstance(rv[1], Model.Condition)
+                self.assertEqual(["One.", "Three.", "Four."], [i.text for i in rv[0:1] + rv[2:]])
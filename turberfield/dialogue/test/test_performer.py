@@ -16,18 +16,26 @@
 # You should have received a copy of the GNU General Public License
 # along with turberfield.  If not, see <http://www.gnu.org/licenses/>.
 
+import asyncio
+import concurrent.futures
 import copy
+from collections import OrderedDict
 from pathlib import Path
 import tempfile
 import unittest
+from unittest import mock
 
 from turberfield.utils.misc import group_by_type
 
+from turberfield.dialogue.compiled import Predicate
 from turberfield.dialogue.model import Model
 from turberfield.dialogue.model import SceneScript
 from turberfield.dialogue.performer import Performer
 from turberfield.dialogue.sequences.battle.logic import ensemble, folder
 from turberfield.dialogue.test.test_model import ConditionDirectiveTests
+from turberfield.dialogue.types import Ensemble
+from turberfield.dialogue.types import Name
+from turberfield.dialogue.types import Player
 
 
 class TestPerformer(unittest.TestCase):
@@ -44,12 +52,189 @@ class TestPerformer(unittest.TestCase):
         performer = Performer(self.schedule, self.ensemble)
         self.assertFalse(performer.stopped)
 
+    def test_ensemble_indexed_once(self):
+        rebuild = Ensemble.rebuild
+        with mock.patch.object(
+            Ensemble, "rebuild", autospec=True, side_effect=rebuild
+        ) as patched:
+            performer = Performer(self.schedule, self.ensemble)
+            self.assertFalse(performer.stopped)
+            self.assertEqual(10, len(list(performer.run())))
+            self.assertTrue(performer.stopped)
+            self.assertEqual(1, patched.call_count)
+
+        self.assertIs(self.ensemble, performer.ensemble.members)
+        self.assertIs(performer.ensemble, Performer(self.schedule, performer.ensemble).ensemble)
+
+    def test_next_uses_manifest(self):
+        performer = Performer(self.schedule, self.ensemble)
+        self.assertFalse(performer.stopped)
+        with mock.patch.object(SceneScript, "read") as read:
+            self.assertFalse(performer.stopped)
+            rv = performer.next(self.schedule, self.ensemble)
+            self.assertFalse(read.called)
+
+        folder, index, script, selection, interlude = rv
+        self.assertEqual(set(SceneScript.manifest(script.fP)), set(selection))
+
+    def test_manifest_follows_changes(self):
+        parent = str(Path(__file__).parent)
+        with tempfile.NamedTemporaryFile(
+            "w", dir=parent, suffix=".rst"
+        ) as scriptFile:
+            scriptFile.write(".. entity:: A\n")
+            scriptFile.flush()
+            self.assertEqual(1, len(SceneScript.manifest(scriptFile.name)))
+            self.assertEqual(1, len(SceneScript.manifest(scriptFile.name)))
+
+            scriptFile.write("\n.. entity:: B\n")
+            scriptFile.flush()
+            self.assertEqual(2, len(SceneScript.manifest(scriptFile.name)))
+
+    def test_manifest_document_reused(self):
+        fP = next(SceneScript.scripts(**self.schedule[0]._asdict())).fP
+        try:
+            with mock.patch.object(
+                SceneScript, "read", autospec=True, side_effect=SceneScript.read
+            ) as read:
+                SceneScript.manifests.pop(fP, None)
+                SceneScript.documents.pop(fP, None)
+                SceneScript.manifest(fP)
+                with SceneScript(fP) as script:
+                    self.assertTrue(script.doc)
+                self.assertEqual(1, read.call_count)
+        finally:
+            SceneScript.documents.clear()
+
+    def test_manifests_bounded(self):
+        paths = [i.fP for i in SceneScript.scripts(**self.schedule[0]._asdict())]
+        with mock.patch.object(SceneScript, "limit", 1), \
+            mock.patch.object(SceneScript, "manifests", OrderedDict()):
+            for fP in paths:
+                SceneScript.manifest(fP)
+                self.assertEqual([fP], list(SceneScript.manifests))
+
+    def test_warm(self):
+        try:
+            rv = SceneScript.warm(self.schedule, processes=2)
+            self.assertEqual(len(self.schedule[0].paths), len(rv))
+            fP, compiled = next(iter(rv.items()))
+            self.assertIn(fP, SceneScript.documents)
+            self.assertEqual(compiled.entities, SceneScript.manifest(fP))
+
+            performer = Performer(self.schedule, self.ensemble)
+            with mock.patch.object(SceneScript, "read") as read:
+                self.assertEqual(10, len(list(performer.run())))
+                self.assertFalse(read.called)
+        finally:
+            SceneScript.documents.clear()
+
+    def test_warm_with_executor(self):
+        try:
+            with concurrent.futures.ThreadPoolExecutor() as executor:
+                rv = SceneScript.warm(self.schedule, executor=executor)
+            fP, compiled = next(iter(rv.items()))
+            cast = compiled.cast(compiled.select(self.ensemble))
+            self.assertEqual(5, len(list(cast)))
+        finally:
+            SceneScript.documents.clear()
+
     def test_play(self):
         performer = Performer(self.schedule, self.ensemble)
         self.assertEqual(10, len(list(performer.run())))
         self.assertEqual(1, len(performer.shots))
         self.assertEqual("action", performer.shots[-1].name)
 
+    def test_play_streaming(self):
+        performer = Performer(self.schedule, self.ensemble)
+        self.assertEqual(10, len(list(performer.run(stream=True))))
+        self.assertEqual(1, len(performer.shots))
+        self.assertEqual("action", performer.shots[-1].name)
+
+    def test_play_async(self):
+
+        async def perform(performer):
+            return [i async for i in performer.arun(stream=True)]
+
+        async def main():
+            return await asyncio.gather(
+                perform(Performer(self.schedule, self.ensemble)),
+                perform(Performer(self.schedule, ensemble())),
+            )
+
+        expected = list(Performer(self.schedule, ensemble()).run())
+        rv = asyncio.run(main())
+        self.assertEqual(2, len(rv))
+        self.assertEqual(
+            [type(i) for i in expected], [type(i) for i in rv[0]]
+        )
+        self.assertEqual(
+            [getattr(i, "text", None) for i in expected], [getattr(i, "text", None) for i in rv[1]]
+        )
+
+    def test_play_async_stopped(self):
+
+        async def perform(performer):
+            return [i async for i in performer.arun()]
+
+        self.assertEqual([], asyncio.run(perform(Performer(self.schedule, []))))
+
+    def test_play_from_shot(self):
+        performer = Performer(self.schedule, self.ensemble)
+        self.assertEqual({}, performer.shot_index)
+        self.assertEqual(10, len(list(performer.run(start_at=("combat", "action")))))
+        self.assertEqual({("combat", "action"): 0}, performer.shot_index)
+
+    def test_play_from_missing_shot(self):
+        performer = Performer(self.schedule, self.ensemble)
+        with self.assertRaises(KeyError):
+            list(performer.run(start_at=("combat", "retreat")))
+
+    def test_evaluate_reuses_result(self):
+        weather = ConditionDirectiveTests.Rain().set_state(ConditionDirectiveTests.Weather.stormy)
+        player = Player(name="Mr William Fuzzer Testfixture")
+        player.items = []
+        conditions = [
+            Model.Condition(weather, "state", None, ConditionDirectiveTests.Weather.stormy),
+            Model.Condition(player, "name.firstname", None, "William"),
+            Model.Condition(player, "items", None, "[]"),
+            Model.Condition(player, "nickname", None, "Bill"),
+        ]
+        conditions = [i._replace(predicate=Predicate(i.format, i.regex)) for i in conditions]
+        performer = Performer(self.schedule, self.ensemble)
+        self.assertEqual([True, True, True], [performer.evaluate(i) for i in conditions[:3]])
+
+        with mock.patch.object(Performer, "allows", wraps=Performer.allows) as allows:
+            self.assertEqual([True, True, True], [performer.evaluate(i) for i in conditions[:3]])
+            self.assertEqual([conditions[2]], [i.args[0] for i in allows.call_args_list])
+
+            # Mutable and computed attributes are always evaluated again
+            player.items.append("hat")
+            self.assertFalse(performer.evaluate(conditions[2]))
+            performer.evaluate(conditions[3])
+            performer.evaluate(conditions[3])
+            self.assertEqual(4, allows.call_count)
+
+            weather.set_state(ConditionDirectiveTests.Weather.quiet)
+            player.name = Name("Mr", "Bill", [], "Testfixture")
+            self.assertEqual([False, False], [performer.evaluate(i) for i in conditions[:2]])
+            self.assertEqual(6, allows.call_count)
+
+    def test_evaluations_bounded(self):
+        player = Player(name="Mr William Fuzzer Testfixture")
+        conditions = [
+            Model.Condition(
+                player, "name.firstname", None, i,
+                predicate=Predicate("name.firstname", None)
+            )
+            for i in ("William", "Bill", "Will")
+        ]
+        performer = Performer(self.schedule, self.ensemble)
+        with mock.patch.object(Performer, "limit", 2):
+            self.assertEqual([True, False, False], [performer.evaluate(i) for i in conditions])
+            self.assertEqual(2, len(performer.evaluations))
+            self.assertNotIn(conditions[0].value, [k[2] for k in performer.evaluations])
+
     def test_run_game(self):
         performer = Performer(self.schedule, self.ensemble)
         while not performer.stopped:
@@ -96,3 +281,18 @@ class TestPerformer(unittest.TestCase):
             performer = Performer([folder], ConditionDirectiveTests.effects[0:1])
             output = list(performer.run())
             self.assertEqual(2, len([i for i in output if isinstance(i, Model.Line)]))
+
+            # Skipping gated items leaves the output unchanged
+            performer = Performer([folder], ConditionDirectiveTests.effects[0:1])
+            with mock.patch.object(Model, "skip"):
+                self.assertEqual(output, list(performer.run()))
+
+            performer = Performer([folder], ConditionDirectiveTests.effects[0:1])
+            with mock.patch.object(
+                Performer, "react", autospec=True, side_effect=Performer.react
+            ) as react:
+                self.assertEqual(output, list(performer.run()))
+
+            reacted = [c.args[1] for c in react.call_args_list]
+            reacted = [i.text for i in reacted if isinstance(i, Model.Line)]
+            self.assertEqual(["It's stormy!", "Pitter patter."], reacted)
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+# encoding: UTF-8
+
+# This file is part of turberfield.
+#
+# Turberfield is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Turberfield is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with turberfield.  If not, see <http://www.gnu.org/licenses/>.
+
+import asyncio
+from collections.abc import Callable
+import copy
+import io
+import time
+import types
+import unittest
+
+from turberfield.dialogue.clock import Clock
+from turberfield.dialogue.clock import VirtualClock
+from turberfield.dialogue.handlers import TerminalHandler
+from turberfield.dialogue.model import Model
+from turberfield.dialogue.player import arehearse
+from turberfield.dialogue.player import delivery
+from turberfield.dialogue.player import rehearse
+from turberfield.dialogue.sequences.battle.logic import ensemble, folder
+
+
+class DeliveryTests(unittest.TestCase):
+
+    def collect(self, rv):
+
+        async def main():
+            return [i async for i in delivery(rv)]
+
+        return asyncio.run(main())
+
+    def test_iterable(self):
+        self.assertEqual([1, 2], self.collect(iter([1, 2])))
+
+    def test_coroutine(self):
+
+        async def handler():
+            return 1
+
+        self.assertEqual([1], self.collect(handler()))
+
+    def test_asynchronous_generator(self):
+
+        async def interlude():
+            return {}
+
+        async def handler():
+            yield 1
+            yield interlude()
+
+        self.assertEqual([1, {}], self.collect(handler()))
+
+
+class AsyncRehearsalTests(unittest.TestCase):
+
+    class Handler:
+
+        def __init__(self):
+            self.loops = set()
+            self.interludes = []
+
+        async def __call__(self, obj, *args, loop, **kwargs):
+            self.loops.add(loop)
+            if isinstance(obj, Callable) and len(args) == 3:
+                self.interludes.append(args[1])
+                yield obj(*args, loop=loop, **kwargs)
+            else:
+                await asyncio.sleep(0)
+                yield obj
+
+    def setUp(self):
+        self.folder = copy.deepcopy(folder)
+
+    def test_same_as_rehearse(self):
+
+        def handler(obj, *args, loop, **kwargs):
+            yield obj
+
+        async def main():
+            return [i async for i in arehearse(self.folder, ensemble(), self.Handler(), repeat=1)]
+
+        expected = list(rehearse(self.folder, ensemble(), handler, repeat=1))
+        rv = asyncio.run(main())
+        self.assertEqual(
+            [type(i) for i in expected], [type(i) for i in rv]
+        )
+        self.assertEqual(
+            [getattr(i, "text", None) for i in expected], [getattr(i, "text", None) for i in rv]
+        )
+
+    def test_coroutine_interlude(self):
+
+        async def interlude(folder, index, ensemble, loop=None, **kwargs):
+            await asyncio.sleep(0)
+            return None
+
+        async def main(handler):
+            folder = self.folder._replace(interludes=[interlude])
+            return [i async for i in arehearse(folder, ensemble(), handler, repeat=3)]
+
+        handler = self.Handler()
+        rv = asyncio.run(main(handler))
+        self.assertEqual([0], handler.interludes)
+        self.assertEqual(1, len(handler.loops))
+        self.assertIsNone(rv[-1])
+        self.assertTrue(any(isinstance(i, Model.Line) for i in rv))
+
+    def test_concurrent_rehearsals(self):
+
+        async def perform():
+            return [i async for i in arehearse(self.folder, ensemble(), self.Handler())]
+
+        async def main():
+            return await asyncio.gather(*(perform() for i in range(20)))
+
+        rv = asyncio.run(main())
+        self.assertEqual(20, len(rv))
+        self.assertEqual({len(rv[0])}, {len(i) for i in rv})
+
+    def test_rehearse_rejects_coroutine_interlude(self):
+
+        async def interlude(folder, index, ensemble, loop=None, **kwargs):
+            return None
+
+        def handler(obj, *args, loop, **kwargs):
+            yield obj
+
+        folder = self.folder._replace(interludes=[interlude])
+        with self.assertRaises(TypeError):
+            list(rehearse(folder, ensemble(), handler, loop=asyncio.new_event_loop()))
+
+    def test_terminal_handler_rejects_coroutine_interlude(self):
+
+        async def interlude(folder, index, ensemble, loop=None, **kwargs):
+            return None
+
+        handler = TerminalHandler(types.SimpleNamespace(normal="", dim="", stream=io.StringIO()))
+        with self.assertRaises(NotImplementedError) as context:
+            list(handler(interlude, self.folder, 0, [], loop=None))
+        self.assertIn("arehearse", str(context.exception))
+
+
+class TerminalHandlerPlayTests(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = copy.deepcopy(folder)
+
+    def handler(self, clock, pause=1.2, dwell=0.3):
+        return TerminalHandler(
+            types.SimpleNamespace(normal="", dim="", stream=io.StringIO()),
+            pause=pause, dwell=dwell, clock=clock
+        )
+
+    def test_same_timings(self):
+        expected = VirtualClock()
+        list(rehearse(self.folder, ensemble(), self.handler(expected)))
+
+        clock = VirtualClock()
+        handler = self.handler(clock)
+
+        async def main():
+            return [i async for i in arehearse(self.folder, ensemble(), handler.play)]
+
+        rv = asyncio.run(main())
+        self.assertTrue(any(isinstance(i, Model.Line) for i in rv))
+        self.assertIsNone(handler.pauses)
+        self.assertEqual(expected.time(), clock.time())
+        self.assertEqual(
+            [(i.at, i.interval, type(i.obj)) for i in expected.timeline],
+            [(i.at, i.interval, type(i.obj)) for i in clock.timeline]
+        )
+
+    def test_concurrent_pauses(self):
+        clock = VirtualClock()
+        list(rehearse(self.folder, ensemble(), self.handler(clock, pause=0.05, dwell=0)))
+        span = clock.time()
+
+        async def perform():
+            handler = self.handler(Clock(), pause=0.05, dwell=0)
+            return [i async for i in arehearse(self.folder, ensemble(), handler.play)]
+
+        async def main():
+            return await asyncio.gather(*(perform() for i in range(8)))
+
+        then = time.monotonic()
+        asyncio.run(main())
+        self.assertLess(time.monotonic() - then, span * 4)
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+# encoding: UTF-8
+
+# This file is part of turberfield.
+#
+# Turberfield is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Turberfield is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with turberfield.  If not, see <http://www.gnu.org/licenses/>.
+
+import asyncio
+import copy
+import io
+import types
+import unittest
+
+from turberfield.dialogue.clock import VirtualClock
+from turberfield.dialogue.handlers import CGIHandler
+from turberfield.dialogue.player import rehearse
+from turberfield.dialogue.scheduler import Scheduler
+from turberfield.dialogue.sequences.battle.logic import ensemble, folder
+
+
+class Stream(io.StringIO):
+
+    def __init__(self, clock):
+        super().__init__()
+        self.clock = clock
+        self.times = []
+
+    def write(self, text):
+        self.times.append(self.clock.time())
+        return super().write(text)
+
+
+class SchedulerTests(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = VirtualClock()
+        self.scheduler = Scheduler(self.clock)
+
+    def test_pacing(self):
+        a, b = Stream(self.clock), Stream(self.clock)
+        self.assertEqual(0, self.scheduler.put(a, "a1"))
+        self.assertEqual(2, self.scheduler.pause(a, 2))
+        self.assertEqual(2, self.scheduler.put(a, "a2"))
+        self.assertEqual(0, self.scheduler.put(b, "b1"))
+        self.scheduler.pause(b, 1)
+        self.assertEqual(1, self.scheduler.put(b, "b2"))
+        self.assertEqual(4, len(self.scheduler))
+        self.assertEqual(0, self.scheduler.due())
+
+        self.assertEqual(4, self.scheduler.run())
+        self.assertEqual("a1a2", a.getvalue())
+        self.assertEqual([0, 2], a.times)
+        self.assertEqual("b1b2", b.getvalue())
+        self.assertEqual([0, 1], b.times)
+        self.assertEqual(2, self.clock.time())
+        self.assertIsNone(self.scheduler.due())
+        self.assertFalse(self.scheduler.sessions)
+
+    def test_release(self):
+        a = Stream(self.clock)
+        self.scheduler.put(a, "a1")
+        self.scheduler.pause(a, 1)
+        self.scheduler.put(a, "a2")
+        self.assertEqual(1, self.scheduler.release())
+        self.assertEqual(0, self.scheduler.release())
+        self.clock.sleep(1)
+        self.assertEqual(1, self.scheduler.release())
+        self.assertEqual("a1a2", a.getvalue())
+
+    def test_idle_session(self):
+        a = Stream(self.clock)
+        self.scheduler.put(a, "a1")
+        self.scheduler.pause(a, 1)
+        self.scheduler.run()
+        self.clock.sleep(5)
+        self.assertEqual(5, self.scheduler.put(a, "a2"))
+
+    def test_paused_session_expires(self):
+        streams = [Stream(self.clock) for i in range(3)]
+        self.scheduler.pause(streams[0], 1)
+        self.scheduler.put(streams[1], "b1")
+        self.scheduler.pause(streams[1], 2)
+        self.scheduler.pause(streams[2], 3)
+        self.scheduler.pause(streams[2], 1)
+        self.assertEqual(3, len(self.scheduler.sessions))
+
+        self.scheduler.run()
+        self.assertEqual(3, len(self.scheduler.sessions))
+        self.clock.sleep(2)
+        self.assertEqual(0, self.scheduler.release())
+        self.assertEqual([streams[2]], list(self.scheduler.sessions))
+        self.clock.sleep(2)
+        self.scheduler.pause(streams[0], 0)
+        self.assertEqual([streams[0]], list(self.scheduler.sessions))
+        self.scheduler.expire(self.clock.time())
+        self.assertFalse(self.scheduler.sessions)
+        self.assertFalse(self.scheduler.expiry)
+
+    def test_serve(self):
+        streams = [Stream(self.clock) for i in range(100)]
+        for n, stream in enumerate(streams):
+            self.scheduler.pause(stream, n % 10)
+            self.scheduler.put(stream, "x")
+
+        rv = asyncio.run(self.scheduler.serve())
+        self.assertEqual(100, rv)
+        self.assertEqual(9, self.clock.time())
+        self.assertEqual([n % 10 for n in range(100)], [i.times[0] for i in streams])
+
+
+class CGIHandlerTests(unittest.TestCase):
+
+    @staticmethod
+    def events(handler):
+        return [
+            i for i in handler.terminal.stream.getvalue().splitlines()
+            if i.startswith("event:")
+        ]
+
+    def setUp(self):
+        self.folder = copy.deepcopy(folder)
+
+    def test_scheduled_sessions(self):
+        clock = VirtualClock()
+        scheduler = Scheduler(clock)
+        sessions = [
+            CGIHandler(
+                types.SimpleNamespace(normal="", dim="", stream=Stream(clock)),
+                pause=1.2, dwell=0.3, scheduler=scheduler
+            )
+            for i in range(3)
+        ]
+        for handler in sessions:
+            list(rehearse(self.folder, ensemble(), handler))
+
+        self.assertEqual(0, clock.time())
+        self.assertTrue(len(scheduler))
+        scheduler.run()
+
+        wall = VirtualClock()
+        expected = CGIHandler(
+            types.SimpleNamespace(normal="", dim="", stream=Stream(wall)),
+            pause=1.2, dwell=0.3, clock=wall
+        )
+        list(rehearse(self.folder, ensemble(), expected))
+        events = self.events(expected)
+        self.assertIn("event: line", events)
+        for handler in sessions:
+            self.assertEqual(events, self.events(handler))
+        self.assertEqual(
+            expected.terminal.stream.times,
+            sessions[0].terminal.stream.times
+        )
@@ -16,8 +16,11 @@
 # You should have received a copy of the GNU General Public License
 # along with turberfield.  If not, see <http://www.gnu.org/licenses/>.
 
+import enum
 import unittest
 
+from turberfield.dialogue.types import DataObject
+from turberfield.dialogue.types import Ensemble
 from turberfield.dialogue.types import Name
 from turberfield.dialogue.types import Player
 from turberfield.dialogue.types import Stateful
@@ -44,6 +47,109 @@ class TestStateful(unittest.TestCase):
         self.assertEqual(4, s.get_state())
         self.assertEqual(4, s.state)
 
+    def test_version(self):
+        s = Stateful()
+        self.assertEqual(0, Stateful.watch(s))
+        s.set_state(3, 4)
+        self.assertEqual(2, Stateful.version(s))
+        self.assertEqual(0, Stateful.version(3))
+        self.assertEqual(0, Stateful.watch(3))
+
+    def test_version_unwatched(self):
+        p = Player(name="Mr Dick Turpin")
+        p.set_state(12)
+        p.name = Name("Mr", "Richard", [], "Turpin")
+        self.assertEqual(0, Stateful.version(p))
+        self.assertNotIn(p, Stateful.changes)
+
+    def test_version_of_data_object(self):
+        p = Player(name="Mr Dick Turpin")
+        version = Stateful.watch(p)
+        p.set_state(12)
+        self.assertEqual(version + 1, Stateful.version(p))
+        p.name = Name("Mr", "Richard", [], "Turpin")
+        self.assertEqual(version + 2, Stateful.version(p))
+
+
+class TestEnsemble(unittest.TestCase):
+
+    class Mood(enum.Enum):
+        calm = 0
+        angry = 1
+
+    class Animal(Stateful, DataObject):
+        pass
+
+    def setUp(self):
+        self.members = [
+            Player(name="Mr Dick Turpin").set_state(12),
+            TestEnsemble.Animal(name="Itchy").set_state(TestEnsemble.Mood.angry),
+            Player(name="Ms Anna Conda").set_state(TestEnsemble.Mood.calm),
+            DataObject(name="Rusty Chopper"),
+        ]
+        self.ensemble = Ensemble(self.members)
+
+    def test_order(self):
+        self.assertEqual(self.members, list(self.ensemble))
+        self.assertEqual(self.members, list(self.ensemble.candidates()))
+
+    def test_candidates_by_type(self):
+        rv = list(self.ensemble.candidates(types=(Player,)))
+        self.assertEqual([self.members[0], self.members[2]], rv)
+        rv = list(self.ensemble.candidates(types=(Stateful,)))
+        self.assertEqual(self.members[0:3], rv)
+
+    def test_candidates_by_state(self):
+        rv = list(self.ensemble.candidates(states=(TestEnsemble.Mood.angry,)))
+        self.assertEqual([self.members[1]], rv)
+        rv = list(self.ensemble.candidates(types=(Player,), states=(1,)))
+        self.assertEqual([self.members[0]], rv)
+
+    def test_candidates_follow_state(self):
+        self.members[2].state = TestEnsemble.Mood.angry
+        rv = list(self.ensemble.candidates(states=(TestEnsemble.Mood.angry,)))
+        self.assertEqual(self.members[1:3], rv)
+        self.assertFalse(list(self.ensemble.candidates(states=(TestEnsemble.Mood.calm,))))
+
+    def test_discard(self):
+        animal = self.members[1]
+        self.ensemble.discard(animal)
+        self.assertNotIn(animal, self.ensemble)
+        self.assertNotIn(animal, self.members)
+        self.assertFalse(list(self.ensemble.candidates(states=(TestEnsemble.Mood.angry,))))
+        animal.set_state(TestEnsemble.Mood.calm)
+        rv = list(self.ensemble.candidates(states=(TestEnsemble.Mood.calm,)))
+        self.assertEqual([self.members[1]], rv)
+
+    def test_follows_members(self):
+        self.assertFalse(list(self.ensemble.candidates(states=(TestEnsemble.Mood.calm,)))[1:])
+        animal = TestEnsemble.Animal(name="Scratchy").set_state(TestEnsemble.Mood.calm)
+        self.members.append(animal)
+        rv = list(self.ensemble.candidates(states=(TestEnsemble.Mood.calm,)))
+        self.assertEqual([self.members[2], animal], rv)
+
+        self.members.remove(animal)
+        rv = list(self.ensemble.candidates(states=(TestEnsemble.Mood.calm,)))
+        self.assertEqual([self.members[2]], rv)
+
+    def test_unhashable_members(self):
+
+        class Unhashable(Player):
+            __hash__ = None
+
+            def __eq__(self, other):
+                return True
+
+        members = [
+            Unhashable(name="Mr Dick Turpin").set_state(12),
+            Unhashable(name="Ms Anna Conda").set_state(12),
+        ]
+        ensemble = Ensemble(members)
+        rv = list(ensemble.candidates(types=(Player,), states=(12,)))
+        self.assertEqual(2, len(rv))
+        self.assertIs(members[0], rv[0])
+        self.assertIs(members[1], rv[1])
+
 
 class TestPlayer(unittest.TestCase):
 
@@ -17,9 +17,12 @@
 # along with turberfield.  If not, see <http://www.gnu.org/licenses/>.
 
 from collections import namedtuple
+from collections.abc import Hashable
 import enum
+import itertools
 import random
 import uuid
+import weakref
 
 from turberfield.utils.assembly import Assembly
 
@@ -57,6 +60,10 @@ class DataObject:
         for k, v in kwargs.items():
             setattr(self, k, v)
 
+    def __setattr__(self, name, value):
+        super().__setattr__(name, value)
+        Stateful.touch(self)
+
     def __repr__(self):
         return "<{0}> {1}".format(type(self).__name__, vars(self))
 
@@ -84,6 +91,64 @@ class Persona(DataObject):
 
 class Stateful:
 
+    #: The number of changes made to each watched object.
+    #: See :py:meth:`Stateful.watch`.
+    changes = weakref.WeakKeyDictionary()
+
+    #: Changes with every change to a watched object. See :py:class:`Ensemble`.
+    epoch = 0
+
+    ticks = itertools.count(1)
+
+    @staticmethod
+    def watch(obj):
+        """Begin counting the changes made to an object.
+
+        Only the objects which take part in conditions or casting need to be
+        watched. Changes to any other object go uncounted.
+
+        :param obj: A Python object.
+        :return: The current version of the object.
+            See :py:meth:`Stateful.version`.
+
+        """
+        try:
+            return Stateful.changes.setdefault(obj, 0)
+        except TypeError:
+            # Object can't be weakly referenced
+            return 0
+
+    @staticmethod
+    def touch(obj):
+        """Record a change to an object, if it is watched.
+
+        This is done for you by :py:meth:`Stateful.set_state` and whenever
+        an attribute of a :py:class:`DataObject` is set.
+
+        """
+        try:
+            if obj in Stateful.changes:
+                Stateful.changes[obj] += 1
+                Stateful.epoch = next(Stateful.ticks)
+        except TypeError:
+            # Object can't be weakly referenced
+            pass
+
+    @staticmethod
+    def version(obj):
+        """Find how many times an object has changed.
+
+        :param obj: A Python object.
+        :return: An integer which increases with every change of state of the
+            object, and every change to the attributes of a DataObject,
+            once the object is watched.
+
+        """
+        try:
+            return Stateful.changes.get(obj, 0)
+        except TypeError:
+            return 0
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self._states = {}
@@ -99,6 +164,7 @@ class Stateful:
     def set_state(self, *args):
         for value in args:
             self._states[type(value).__name__] = value
+            Stateful.touch(self)
         return self
 
     def get_state(self, typ=int, default=0):
@@ -107,4 +173,136 @@ class Stateful:
 class Player(Persona, Stateful):
     pass
 
+
+class Ensemble:
+    """A collection of personae indexed by type and by state.
+
+    Casting queries an Ensemble for candidates instead of testing
+    every one of its members. The sequence of members remains the
+    source of truth. Before each query the index is rebuilt if members
+    have been added or removed, and any member whose state has changed
+    is indexed again. See :py:meth:`Stateful.version`.
+
+    Members are kept in the order of the sequence.
+
+    :param members: A sequence of Python objects. If it is a list, the
+        Ensemble follows later changes to it.
+
+    """
+
+    def __init__(self, members=()):
+        self.members = members if isinstance(members, list) else list(members)
+        self.snapshot = []
+        self.ids = []
+        self.epoch = None
+        self.types = {}
+        self.states = {}
+        self.untracked = set()
+        self.indexed = {}
+        self.versions = {}
+
+    def __contains__(self, obj):
+        return any(i is obj for i in self.members)
+
+    def __iter__(self):
+        return iter(self.members)
+
+    def __len__(self):
+        return len(self.members)
+
+    def __repr__(self):
+        return "<{0}> {1} members".format(type(self).__name__, len(self))
+
+    def add(self, obj):
+        """Append an object to the members, unless it is one already."""
+        if obj not in self:
+            self.members.append(obj)
+
+    def discard(self, obj):
+        """Remove an object from the members, if it is one."""
+        self.members[:] = [i for i in self.members if i is not obj]
+
+    def rebuild(self):
+        self.snapshot = list(self.members)
+        self.ids = [id(i) for i in self.snapshot]
+        self.types = {}
+        self.states = {}
+        self.untracked = set()
+        self.indexed = {}
+        self.versions = {}
+        for pos, obj in enumerate(self.snapshot):
+            self.types.setdefault(type(obj), []).append(pos)
+            if isinstance(obj, Stateful) and isinstance(obj, Hashable):
+                self.versions[pos] = Stateful.watch(obj)
+                self.index(pos, obj)
+            elif hasattr(obj, "get_state"):
+                # Changes to this object's state can't be followed
+                self.untracked.add(pos)
+
+    def index(self, pos, obj):
+        self.indexed[pos] = list(obj._states.items())
+        for key, value in self.indexed[pos]:
+            try:
+                self.states.setdefault(key, {}).setdefault(value, set()).add(pos)
+            except TypeError:
+                # Unhashable state value
+                self.untracked.add(pos)
+
+    def unindex(self, pos):
+        self.untracked.discard(pos)
+        for key, value in self.indexed.pop(pos, ()):
+            try:
+                self.states[key][value].discard(pos)
+            except (KeyError, TypeError):
+                pass
+
+    def sync(self):
+        """Bring the index up to date with the members and their states."""
+        epoch = Stateful.epoch
+        if [id(i) for i in self.members] != self.ids:
+            self.rebuild()
+        elif epoch != self.epoch:
+            for pos, version in self.versions.items():
+                obj = self.snapshot[pos]
+                current = Stateful.version(obj)
+                if current != version:
+                    self.versions[pos] = current
+                    self.unindex(pos)
+                    self.index(pos, obj)
+        self.epoch = epoch
+
+    def candidates(self, types=(), states=()):
+        """Find those members which might be of the types and in the states given.
+
+        :param types: A tuple of types. Candidates are instances of any one of them.
+        :param states: A sequence of state values. Candidates have a state
+            which begins with each of these, as in the comparison made by
+            :py:meth:`~turberfield.dialogue.compiled.CompiledScript.choose`.
+        :return: An iterator over the candidates in the order of the members.
+
+        """
+        self.sync()
+        rv = None
+        if types:
+            rv = set().union(*(
+                positions for typ, positions in self.types.items() if issubclass(typ, types)
+            ))
+
+        for state in states:
+            prefix = str(state)
+            if str(0).startswith(prefix):
+                # Matches those with no state of this type
+                continue
+
+            matched = set(self.untracked)
+            for value, positions in self.states.get(type(state).__name__, {}).items():
+                if str(value).startswith(prefix):
+                    matched.update(positions)
+            rv = matched if rv is None else rv & matched
+
+        if rv is None:
+            return iter(self.snapshot)
+        else:
+            return (self.snapshot[i] for i in sorted(rv))
+
 Assembly.register(Name, type(uuid.uuid4()))
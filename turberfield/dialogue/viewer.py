@@ -39,6 +39,7 @@ from turberfield.dialogue.cli import add_casting_options
 from turberfield.dialogue.cli import add_common_options
 from turberfield.dialogue.cli import add_performance_options
 from turberfield.dialogue.cli import resolve_objects
+from turberfield.dialogue.clock import VirtualClock
 from turberfield.dialogue.handlers import CGIHandler
 from turberfield.dialogue.handlers import TerminalHandler
 from turberfield.dialogue.model import Model
@@ -191,7 +192,8 @@ def cgi_producer(args, stream=None):
             Terminal(stream=stream),
             None if args.db == "None" else args.db,
             float(args.pause),
-            float(args.dwell)
+            float(args.dwell),
+            clock=VirtualClock() if args.virtual else None
         )
     except Exception as e:
         log.error(e)
@@ -216,7 +218,10 @@ def cgi_producer(args, stream=None):
         log.debug(references)
 
 def presenter(args):
-    handler = TerminalHandler(Terminal(), args.db, args.pause, args.dwell)
+    handler = TerminalHandler(
+        Terminal(), args.db, args.pause, args.dwell,
+        clock=VirtualClock() if args.virtual else None
+    )
     folders, references = resolve_objects(args)
     Assembly.register(*(i if isinstance(i, type) else type(i) for i in references))
 
@@ -251,7 +256,7 @@ def main(args):
             for k in (
                 "log_level", "log_path", "port",
                 "session", "locn", "references",
-                "pause", "dwell", "repeat", "roles", "strict"
+                "pause", "dwell", "repeat", "roles", "strict", "virtual"
             )
         ]
         params.extend([("folder", i) for i in args.folder])
@@ -280,6 +285,9 @@ def main(args):
             for key in vars(args).keys()
         }
         params["folder"] = form.getlist("folder")
+        for key in ("strict", "virtual"):
+            # Flags arrive as the strings "True" or "False"
+            params[key] = params.get(key) == "True"
         log_manager = LogManager()
         log = log_manager.get_logger("turberfield")
         log.info("params")